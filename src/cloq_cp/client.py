@@ -0,0 +1,161 @@
+"""
+Control Plane Client - HTTP access to the Cloq control plane
+
+This module provides:
+- A pooled requests.Session shared by all control-plane calls
+- Upload, download and listing helpers used by the vendor and enterprise CLIs
+"""
+
+import os
+import uuid
+from typing import Dict, Any, Iterator
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+DEFAULT_CONTROL_PLANE_URL = "http://localhost:9000"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+USER_AGENT = "cloq-cli/0.1.0"
+DEFAULT_TIMEOUT = (5, 60)  # (connect, read) seconds
+
+
+class ControlPlaneError(Exception):
+    """Raised when a control plane request fails"""
+    pass
+
+
+class _MultipartFileBody:
+    """
+    Single-file multipart/form-data body, streamed from disk in chunks
+
+    Defining __len__ lets requests send a Content-Length header instead of
+    falling back to chunked transfer encoding, while iteration still reads
+    the file UPLOAD_CHUNK_SIZE bytes at a time.
+    """
+
+    def __init__(self, file_path: str, boundary: str, field_name: str = 'file'):
+        """
+        Args:
+            file_path: Path to the file to send
+            boundary: Multipart boundary string
+            field_name: Form field name expected by the control plane
+        """
+        self.file_path = file_path
+        filename = os.path.basename(file_path).replace('"', '%22')
+        self._head = (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'
+        ).encode('utf-8')
+        self._tail = f'\r\n--{boundary}--\r\n'.encode('utf-8')
+        self._length = len(self._head) + os.path.getsize(file_path) + len(self._tail)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self._head
+
+        with open(self.file_path, 'rb') as f:
+            while chunk := f.read(UPLOAD_CHUNK_SIZE):
+                yield chunk
+
+        yield self._tail
+
+
+class ControlPlaneClient:
+    """Thin HTTP client for the control plane API"""
+
+    def __init__(self, base_url: str = DEFAULT_CONTROL_PLANE_URL):
+        self.base_url = base_url.rstrip('/')
+
+        # One keep-alive connection pool for every call made by this client
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(total=2, backoff_factor=0.2)
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # requests already negotiates gzip/deflate and keep-alive; identify
+        # ourselves so the control plane can tell CLI traffic apart
+        self.session.headers["User-Agent"] = USER_AGENT
+
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """
+        Issue a request against the control plane
+
+        Args:
+            method: HTTP method
+            path: API path, e.g. "/list"
+            **kwargs: Extra arguments passed to requests
+
+        Returns:
+            Response with a successful status code
+        """
+        kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+        url = f"{self.base_url}{path}"
+
+        try:
+            response = self.session.request(method, url, **kwargs)
+            response.raise_for_status()
+            return response
+        except requests.exceptions.ConnectionError:
+            raise ControlPlaneError(f"Cannot connect to control plane at {self.base_url}. Is it running?")
+        except requests.exceptions.HTTPError as e:
+            raise ControlPlaneError(f"{method} {path} failed: {e.response.status_code} {e.response.text}")
+        except requests.exceptions.RequestException as e:
+            raise ControlPlaneError(f"{method} {path} failed: {str(e)}")
+
+    def health(self) -> Dict[str, Any]:
+        """Fetch control plane health information"""
+        return self._request('GET', '/health').json()
+
+    def upload(self, file_path: str) -> Dict[str, Any]:
+        """
+        Upload an encrypted bundle
+
+        Args:
+            file_path: Path to the bundle to upload
+
+        Returns:
+            Upload response including the assigned artifact ID
+        """
+        # Stream the multipart body instead of letting requests assemble
+        # the whole encoded payload in memory first; its length is known up
+        # front, so it goes out with Content-Length rather than chunked
+        boundary = uuid.uuid4().hex
+        response = self._request(
+            'POST', '/upload',
+            data=_MultipartFileBody(file_path, boundary),
+            headers={'Content-Type': f'multipart/form-data; boundary={boundary}'}
+        )
+        return response.json()
+
+    def download(self, artifact_id: str, output_path: str) -> str:
+        """
+        Download an encrypted bundle
+
+        Args:
+            artifact_id: Artifact ID to download
+            output_path: Path to save the bundle
+
+        Returns:
+            Path to saved bundle
+        """
+        # Stream the body to disk so large bundles never sit fully in memory
+        with self._request('GET', f"/download/{artifact_id}", stream=True) as response:
+            with open(output_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+
+        return output_path
+
+    def list_artifacts(self) -> Dict[str, Any]:
+        """List artifacts stored on the control plane"""
+        return self._request('GET', '/list').json()
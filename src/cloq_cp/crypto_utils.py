@@ -4,34 +4,180 @@ Cloq Crypto Utils - Local encryption SDK for vendors
 
 This module provides cryptographic primitives for the Cloq system:
 - RSA keypair generation for vendors and enterprises
-- Hybrid encryption (AES + RSA) for file encryption
+- Hybrid encryption (AES-GCM or ChaCha20-Poly1305 + RSA) for file encryption
 - Standalone encryption/decryption without control plane dependency
 
 This simulates the local Cloq encryption SDK that vendors can use to
 self-encrypt their software before sending it to the control plane.
 """
 
+import io
 import os
+import mmap
 import json
-import base64
+import struct
 import logging
-from typing import Tuple, Dict, Any
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Tuple, Dict, Any, BinaryIO, Iterator, Union, List, Optional
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+from cryptography.exceptions import InvalidTag
 
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# OAEP padding is immutable, so build it once and share it across calls
+_OAEP_PADDING = padding.OAEP(
+    mgf=padding.MGF1(algorithm=hashes.SHA256()),
+    algorithm=hashes.SHA256(),
+    label=None
+)
+
+# Binary bundle layout:
+#   header (magic, version, iv, frame_size, key_len, metadata_len) |
+#   encrypted AES key | metadata JSON | frame 0 | frame 1 | ...
+# Each frame is an independent AEAD message (ciphertext + 16-byte tag) of
+# up to frame_size plaintext bytes. Frame i uses nonce iv XOR i, and its
+# associated data is the full header plus a final-frame flag, so frames
+# cannot be reordered, truncated or moved between bundles undetected.
+# The metadata's "cipher" field names the AEAD; bundles without it are AES-GCM.
+BUNDLE_MAGIC = b'CLQ1'
+BUNDLE_VERSION = 2
+_BUNDLE_HEADER = struct.Struct('<4sH12sIII')
+GCM_IV_SIZE = 12
+GCM_TAG_SIZE = 16
+FRAME_SIZE = 1024 * 1024  # 1 MiB
+_MAX_FRAME_SIZE = 64 * 1024 * 1024  # bounds memory when reading untrusted bundles
+
+# Both AEADs take a 256-bit key and 96-bit nonce and produce a 16-byte tag,
+# so they share the frame layout above
+CIPHER_AES_GCM = 'AES-256-GCM'
+CIPHER_CHACHA20 = 'ChaCha20-Poly1305'
+_AEAD_CLASSES = {
+    CIPHER_AES_GCM: AESGCM,
+    CIPHER_CHACHA20: ChaCha20Poly1305,
+}
+
 
 class CryptoError(Exception):
     """Custom exception for crypto operations"""
     pass
 
 
+def _ensure_parent_dirs(*paths: str) -> None:
+    """Create each distinct parent directory of the given paths once"""
+    for directory in {os.path.dirname(path) for path in paths} - {''}:
+        os.makedirs(directory, exist_ok=True)
+
+
+def _reject_same_file(input_path: str, output_path: str) -> None:
+    """
+    Refuse to write output over its own input
+    
+    Outputs are opened for writing before the input is mapped, so the same
+    path (or a link to it) would truncate the input first.
+    """
+    if os.path.exists(output_path) and os.path.samefile(input_path, output_path):
+        raise CryptoError(f"Output path {output_path} is the input file")
+
+
+def _read_full(source: BinaryIO, size: int) -> bytes:
+    """
+    Read size bytes, or whatever is left before EOF
+    
+    Pipes, sockets and raw streams may return fewer bytes than asked for
+    without being at EOF; keep reading so frames line up with frame_size.
+    """
+    chunk = source.read(size)
+    if not chunk or len(chunk) == size:
+        return chunk
+    
+    parts = [chunk]
+    remaining = size - len(chunk)
+    while remaining:
+        part = source.read(remaining)
+        if not part:
+            break
+        parts.append(part)
+        remaining -= len(part)
+    return b''.join(parts)
+
+
+def _iter_frames(source: Union[BinaryIO, bytes, memoryview, mmap.mmap],
+                 size: int) -> Iterator[Tuple[Any, bool]]:
+    """
+    Split a file object or buffer into (chunk, is_last) pairs
+    
+    Buffers are sliced without copying. An empty source yields a single empty
+    final chunk so every bundle carries at least one authenticated frame.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        with memoryview(source) as view:
+            total = len(view)
+            for offset in range(0, max(total, 1), size):
+                with view[offset:offset + size] as chunk:
+                    yield chunk, offset + size >= total
+    else:
+        chunk = _read_full(source, size)
+        while True:
+            next_chunk = _read_full(source, size)
+            yield chunk, not next_chunk
+            if not next_chunk:
+                break
+            chunk = next_chunk
+
+
+@functools.lru_cache(maxsize=None)
+def default_cipher() -> str:
+    """
+    Pick the bulk cipher for new bundles
+    
+    AES-GCM is only fast with hardware AES; without it (older x86, ARM cores
+    lacking the crypto extensions) ChaCha20-Poly1305 is 2-3x faster. The
+    CPU flags are read from /proc/cpuinfo; where that is unavailable
+    AES-GCM is assumed.
+    """
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key.strip() in ('flags', 'Features'):
+                    return CIPHER_AES_GCM if 'aes' in value.split() else CIPHER_CHACHA20
+    except OSError:
+        pass
+    return CIPHER_AES_GCM
+
+
+def _bundle_cipher(metadata: Dict[str, Any]) -> str:
+    """Return the bulk cipher recorded in a bundle's metadata"""
+    cipher = metadata.get('cipher', CIPHER_AES_GCM)
+    if cipher not in _AEAD_CLASSES:
+        raise CryptoError(f"Unsupported bundle cipher: {cipher}")
+    return cipher
+
+
+def _frame_nonce(iv: bytes, index: int) -> bytes:
+    """Derive the per-frame GCM nonce by XOR-ing the frame counter into the IV"""
+    return (int.from_bytes(iv, 'big') ^ index).to_bytes(GCM_IV_SIZE, 'big')
+
+
+@functools.lru_cache(maxsize=32)
+def _load_public_key(public_key_pem: bytes) -> rsa.RSAPublicKey:
+    """Parse a PEM public key once per distinct PEM"""
+    return serialization.load_pem_public_key(public_key_pem)
+
+
+@functools.lru_cache(maxsize=32)
+def _load_private_key(private_key_pem: bytes) -> rsa.RSAPrivateKey:
+    """Parse a PEM private key once per distinct PEM"""
+    return serialization.load_pem_private_key(private_key_pem, password=None)
+
+
 def generate_rsa_keypair(key_size: int = 4096) -> Tuple[bytes, bytes]:
     """
     Generate RSA keypair for vendors or enterprises
@@ -48,8 +194,7 @@ def generate_rsa_keypair(key_size: int = 4096) -> Tuple[bytes, bytes]:
         # Generate private key
         private_key = rsa.generate_private_key(
             public_exponent=65537,
-            key_size=key_size,
-            backend=default_backend()
+            key_size=key_size
         )
         
         # Get public key
@@ -78,104 +223,128 @@ def generate_rsa_keypair(key_size: int = 4096) -> Tuple[bytes, bytes]:
 def save_keypair(private_key: bytes, public_key: bytes, 
                 private_path: str, public_path: str) -> None:
     """Save keypair to files"""
-    try:
-        logger.info(f"Saving keys to {private_path} and {public_path}")
+    logger.info(f"Saving keys to {private_path} and {public_path}")
+    
+    # Ensure directories exist (usually one shared directory)
+    _ensure_parent_dirs(private_path, public_path)
+    
+    with open(private_path, 'wb') as f:
+        f.write(private_key)
+    with open(public_path, 'wb') as f:
+        f.write(public_key)
         
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(private_path), exist_ok=True)
-        os.makedirs(os.path.dirname(public_path), exist_ok=True)
+    logger.info("✓ Keypair saved successfully")
+
+
+def load_or_generate_keypair(private_path: str, public_path: str,
+                             key_size: int = 4096) -> Tuple[bytes, bytes]:
+    """
+    Reuse a saved keypair if both PEM files are valid, otherwise create one
+    
+    RSA keygen dominates the cost of short workflows (seconds for 4096-bit
+    keys), so demos and repeated runs should persist their keys.
+    
+    Args:
+        private_path: Path to the private key PEM
+        public_path: Path to the public key PEM
+        key_size: RSA key size in bits used when a new keypair is generated
         
-        with open(private_path, 'wb') as f:
-            f.write(private_key)
-        with open(public_path, 'wb') as f:
-            f.write(public_key)
+    Returns:
+        Tuple of (private_key_pem, public_key_pem) as bytes
+    """
+    if os.path.exists(private_path) and os.path.exists(public_path):
+        try:
+            private_pem = Path(private_path).read_bytes()
+            public_pem = Path(public_path).read_bytes()
             
-        logger.info("✓ Keypair saved successfully")
-        
-    except Exception as e:
-        logger.error(f"Failed to save keypair: {str(e)}")
-        raise CryptoError(f"Failed to save keypair: {str(e)}")
+            private_key = _load_private_key(private_pem)
+            public_key = _load_public_key(public_pem)
+            if private_key.public_key().public_numbers() == public_key.public_numbers():
+                logger.info(f"✓ Reusing RSA keypair from {private_path}")
+                return private_pem, public_pem
+        except (ValueError, TypeError, AttributeError):
+            pass
+        
+        logger.warning(f"Saved keypair at {private_path} is invalid, regenerating")
+    
+    private_pem, public_pem = generate_rsa_keypair(key_size)
+    save_keypair(private_pem, public_pem, private_path, public_path)
+    return private_pem, public_pem
 
 
 def generate_aes_key() -> bytes:
     """Generate random 256-bit AES key"""
-    logger.info("Generating random AES-256 key...")
+    logger.debug("Generating random AES-256 key...")
     return os.urandom(32)  # 256 bits
 
 
-def encrypt_file_aes(file_data: bytes, aes_key: bytes) -> Tuple[bytes, bytes]:
+def encrypt_file_aes(in_file: Union[BinaryIO, bytes, memoryview, mmap.mmap],
+                     out_file: BinaryIO, aes_key: bytes, iv: bytes,
+                     associated_data: bytes = b'', frame_size: int = FRAME_SIZE,
+                     cipher: str = CIPHER_AES_GCM) -> int:
     """
-    Encrypt file data using AES-256-GCM
+    Encrypt a file object as a sequence of AEAD frames
     
     Args:
-        file_data: Raw file data to encrypt
+        in_file: Readable binary file, or a buffer such as an mmap, with the plaintext
+        out_file: Writable binary file receiving the frames
         aes_key: 256-bit AES key
+        iv: 96-bit base nonce
+        associated_data: Extra data to authenticate with every frame
+        frame_size: Plaintext bytes per frame
+        cipher: CIPHER_AES_GCM or CIPHER_CHACHA20
         
     Returns:
-        Tuple of (encrypted_data_with_tag, iv)
+        Number of frames written
     """
-    try:
-        logger.info("Encrypting file with AES-256-GCM...")
-        
-        # Generate random IV
-        iv = os.urandom(12)  # 96 bits for GCM mode
-        
-        # Create cipher
-        cipher = Cipher(
-            algorithms.AES(aes_key),
-            modes.GCM(iv),
-            backend=default_backend()
-        )
-        encryptor = cipher.encryptor()
-        
-        # Encrypt data
-        encrypted_data = encryptor.update(file_data) + encryptor.finalize()
-        
-        # Return encrypted data with auth tag
-        logger.info("✓ File encrypted with AES-256-GCM")
-        return encrypted_data + encryptor.tag, iv
-        
-    except Exception as e:
-        logger.error(f"Failed to encrypt file: {str(e)}")
-        raise CryptoError(f"Failed to encrypt file: {str(e)}")
+    logger.debug(f"Encrypting file with {cipher}...")
+    
+    aead = _AEAD_CLASSES[cipher](aes_key)
+    frame_aad = (associated_data + b'\x00', associated_data + b'\x01')
+    
+    frames = 0
+    for chunk, is_last in _iter_frames(in_file, frame_size):
+        nonce = _frame_nonce(iv, frames)
+        out_file.write(aead.encrypt(nonce, chunk, frame_aad[is_last]))
+        frames += 1
+    
+    logger.debug(f"✓ File encrypted with {cipher}")
+    return frames
 
 
-def decrypt_file_aes(encrypted_data: bytes, aes_key: bytes, iv: bytes) -> bytes:
+def decrypt_file_aes(in_file: Union[BinaryIO, bytes, memoryview, mmap.mmap],
+                     out_file: BinaryIO, aes_key: bytes,
+                     iv: bytes, associated_data: bytes = b'',
+                     frame_size: int = FRAME_SIZE, cipher: str = CIPHER_AES_GCM) -> None:
     """
-    Decrypt file data using AES-256-GCM
+    Decrypt a sequence of AEAD frames
     
     Args:
-        encrypted_data: Encrypted data with auth tag appended
+        in_file: Readable binary file positioned at the first frame, or a
+            buffer holding just the frames
+        out_file: Writable binary file receiving the plaintext
         aes_key: 256-bit AES key
-        iv: Initialization vector
-        
-    Returns:
-        Decrypted file data
+        iv: 96-bit base nonce
+        associated_data: Extra data that was authenticated with every frame
+        frame_size: Plaintext bytes per frame
+        cipher: CIPHER_AES_GCM or CIPHER_CHACHA20
     """
-    try:
-        logger.info("Decrypting file with AES-256-GCM...")
-        
-        # Split encrypted data and auth tag
-        auth_tag = encrypted_data[-16:]  # GCM auth tag is 16 bytes
-        ciphertext = encrypted_data[:-16]
-        
-        # Create cipher
-        cipher = Cipher(
-            algorithms.AES(aes_key),
-            modes.GCM(iv, auth_tag),
-            backend=default_backend()
-        )
-        decryptor = cipher.decryptor()
-        
-        # Decrypt data
-        decrypted_data = decryptor.update(ciphertext) + decryptor.finalize()
-        
-        logger.info("✓ File decrypted with AES-256-GCM")
-        return decrypted_data
-        
-    except Exception as e:
-        logger.error(f"Failed to decrypt file: {str(e)}")
-        raise CryptoError(f"Failed to decrypt file: {str(e)}")
+    logger.debug(f"Decrypting file with {cipher}...")
+    
+    aead = _AEAD_CLASSES[cipher](aes_key)
+    frame_aad = (associated_data + b'\x00', associated_data + b'\x01')
+    
+    frames = 0
+    for frame, is_last in _iter_frames(in_file, frame_size + GCM_TAG_SIZE):
+        if not frame:
+            raise CryptoError("Encrypted bundle is truncated")
+        
+        # Raises InvalidTag if the frame, its position or the header changed
+        nonce = _frame_nonce(iv, frames)
+        out_file.write(aead.decrypt(nonce, frame, frame_aad[is_last]))
+        frames += 1
+    
+    logger.debug(f"✓ File decrypted with {cipher}")
 
 
 def encrypt_aes_key_with_rsa(aes_key: bytes, public_key_pem: bytes) -> bytes:
@@ -189,31 +358,19 @@ def encrypt_aes_key_with_rsa(aes_key: bytes, public_key_pem: bytes) -> bytes:
     Returns:
         Encrypted AES key
     """
-    try:
-        logger.info("Encrypting AES key with RSA public key...")
-        
-        # Load public key
-        public_key = serialization.load_pem_public_key(
-            public_key_pem,
-            backend=default_backend()
-        )
-        
-        # Encrypt AES key
-        encrypted_key = public_key.encrypt(
-            aes_key,
-            padding.OAEP(
-                mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None
-            )
-        )
-        
-        logger.info("✓ AES key encrypted with RSA")
-        return encrypted_key
-        
-    except Exception as e:
-        logger.error(f"Failed to encrypt AES key: {str(e)}")
-        raise CryptoError(f"Failed to encrypt AES key: {str(e)}")
+    logger.debug("Encrypting AES key with RSA public key...")
+    
+    # Load public key (cached, batch encryption reuses the same PEM)
+    public_key = _load_public_key(public_key_pem)
+    
+    # Encrypt AES key
+    encrypted_key = public_key.encrypt(
+        aes_key,
+        _OAEP_PADDING
+    )
+    
+    logger.debug("✓ AES key encrypted with RSA")
+    return encrypted_key
 
 
 def decrypt_aes_key_with_rsa(encrypted_aes_key: bytes, private_key_pem: bytes) -> bytes:
@@ -227,32 +384,336 @@ def decrypt_aes_key_with_rsa(encrypted_aes_key: bytes, private_key_pem: bytes) -
     Returns:
         Decrypted AES key
     """
+    logger.debug("Decrypting AES key with RSA private key...")
+    
+    # Load private key (cached, batch decryption reuses the same PEM)
+    private_key = _load_private_key(private_key_pem)
+    
+    # Decrypt AES key
+    aes_key = private_key.decrypt(
+        encrypted_aes_key,
+        _OAEP_PADDING
+    )
+    
+    logger.debug("✓ AES key decrypted with RSA")
+    return aes_key
+
+
+def _read_bundle_header(f: BinaryIO) -> Tuple[bytes, int, bytes, Dict[str, Any], bytes]:
+    """
+    Parse the binary bundle header from the start of an open bundle
+    
+    Args:
+        f: Bundle opened in binary mode, positioned at offset 0
+        
+    Returns:
+        Tuple of (iv, frame_size, encrypted_aes_key, metadata, raw_header_bytes)
+    """
+    fixed = f.read(_BUNDLE_HEADER.size)
+    if len(fixed) != _BUNDLE_HEADER.size:
+        raise CryptoError("Encrypted bundle is truncated")
+    
+    magic, version, iv, frame_size, key_len, metadata_len = _BUNDLE_HEADER.unpack(fixed)
+    if magic != BUNDLE_MAGIC:
+        raise CryptoError("Not a Cloq encrypted bundle")
+    if version != BUNDLE_VERSION:
+        raise CryptoError(f"Unsupported bundle version: {version}")
+    if not 0 < frame_size <= _MAX_FRAME_SIZE:
+        raise CryptoError(f"Invalid bundle frame size: {frame_size}")
+    
+    variable = f.read(key_len + metadata_len)
+    if len(variable) != key_len + metadata_len:
+        raise CryptoError("Encrypted bundle is truncated")
+    
+    encrypted_aes_key = variable[:key_len]
+    metadata = json.loads(variable[key_len:])
+    return iv, frame_size, encrypted_aes_key, metadata, fixed + variable
+
+
+def read_bundle_metadata(encrypted_bundle_path: str) -> Dict[str, Any]:
+    """
+    Read the plaintext metadata of an encrypted bundle without decrypting it
+    
+    Args:
+        encrypted_bundle_path: Path to encrypted bundle
+        
+    Returns:
+        Bundle metadata dictionary
+    """
     try:
-        logger.info("Decrypting AES key with RSA private key...")
+        with open(encrypted_bundle_path, 'rb') as f:
+            return _read_bundle_header(f)[3]
+    except CryptoError:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to read bundle metadata: {str(e)}")
+        raise CryptoError(f"Failed to read bundle metadata: {str(e)}")
+
+
+def _build_bundle_header(public_key_pem: bytes, original_filename: str,
+                         original_size: Optional[int], cipher: str) -> Tuple[bytes, bytes, bytes]:
+    """
+    Create a fresh AES key and IV and the bundle header that carries them
+    
+    Args:
+        public_key_pem: RSA public key in PEM format
+        original_filename: Name recorded in the bundle metadata
+        original_size: Plaintext size in bytes, or None if not known up front
+        cipher: Bulk cipher recorded in the bundle metadata
         
-        # Load private key
-        private_key = serialization.load_pem_private_key(
-            private_key_pem,
-            password=None,
-            backend=default_backend()
-        )
+    Returns:
+        Tuple of (aes_key, iv, header_bytes)
+    """
+    # Generate random AES key and wrap it with RSA
+    aes_key = generate_aes_key()
+    encrypted_aes_key = encrypt_aes_key_with_rsa(aes_key, public_key_pem)
+    iv = os.urandom(GCM_IV_SIZE)  # 96 bits for GCM mode
+    
+    encrypted_size = None
+    if original_size is not None:
+        frame_count = max(1, -(-original_size // FRAME_SIZE))
+        encrypted_size = original_size + frame_count * GCM_TAG_SIZE
+    
+    metadata = {
+        'original_filename': original_filename,
+        'original_size': original_size,
+        'encrypted_size': encrypted_size,
+        'cipher': cipher,
+        # OAEP ciphertext is exactly the modulus size
+        'algorithm': f'{cipher} + RSA-{len(encrypted_aes_key) * 8}',
+        'created_by': 'cloq_crypto_utils'
+    }
+    metadata_bytes = json.dumps(metadata, separators=(',', ':')).encode('utf-8')
+    
+    header = _BUNDLE_HEADER.pack(
+        BUNDLE_MAGIC, BUNDLE_VERSION, iv, FRAME_SIZE,
+        len(encrypted_aes_key), len(metadata_bytes)
+    ) + encrypted_aes_key + metadata_bytes
+    return aes_key, iv, header
+
+
+def encrypt_bytes(plaintext: Union[bytes, memoryview], public_key_pem: bytes,
+                  original_filename: str = '') -> bytes:
+    """
+    Encrypt an in-memory payload into a bundle, without touching disk
+    
+    Args:
+        plaintext: Data to encrypt
+        public_key_pem: RSA public key in PEM format
+        original_filename: Name recorded in the bundle metadata
         
-        # Decrypt AES key
-        aes_key = private_key.decrypt(
-            encrypted_aes_key,
-            padding.OAEP(
-                mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None
-            )
-        )
+    Returns:
+        Encrypted bundle bytes, identical in format to encrypt_file output
+    """
+    try:
+        cipher = default_cipher()
+        aes_key, iv, header = _build_bundle_header(public_key_pem, original_filename,
+                                                   len(plaintext), cipher)
         
-        logger.info("✓ AES key decrypted with RSA")
-        return aes_key
+        out = io.BytesIO()
+        out.write(header)
+        encrypt_file_aes(plaintext, out, aes_key, iv, header, cipher=cipher)
+        return out.getvalue()
         
     except Exception as e:
-        logger.error(f"Failed to decrypt AES key: {str(e)}")
-        raise CryptoError(f"Failed to decrypt AES key: {str(e)}")
+        logger.error(f"Failed to encrypt data: {e}")
+        raise CryptoError(f"Failed to encrypt data: {e}") from e
+
+
+def decrypt_bytes(bundle: Union[bytes, memoryview], private_key_pem: bytes) -> bytes:
+    """
+    Decrypt an in-memory bundle, without touching disk
+    
+    Args:
+        bundle: Encrypted bundle bytes
+        private_key_pem: RSA private key in PEM format
+        
+    Returns:
+        Decrypted plaintext
+    """
+    try:
+        with io.BytesIO(bundle) as f:
+            iv, frame_size, encrypted_aes_key, metadata, header = _read_bundle_header(f)
+        cipher = _bundle_cipher(metadata)
+        aes_key = decrypt_aes_key_with_rsa(encrypted_aes_key, private_key_pem)
+        
+        # Frames are sliced straight out of the caller's buffer
+        out = io.BytesIO()
+        with memoryview(bundle) as view:
+            decrypt_file_aes(view[len(header):], out, aes_key, iv, header, frame_size, cipher)
+        return out.getvalue()
+        
+    except InvalidTag as e:
+        logger.error("Failed to decrypt data: authentication tag mismatch")
+        raise CryptoError("Failed to decrypt data: bundle is corrupted or was tampered with") from e
+    except Exception as e:
+        logger.error(f"Failed to decrypt data: {e}")
+        raise CryptoError(f"Failed to decrypt data: {e}") from e
+
+
+class BundleWriter:
+    """
+    Writable file object that encrypts everything written to it into a bundle
+    
+    Lets producers such as tarfile stream straight into an encrypted bundle
+    with no intermediate plaintext file. Data is framed exactly as
+    encrypt_file frames it; the plaintext size is not known when the header
+    is written, so the metadata records original_size and encrypted_size as
+    null. close() must be called to write the final frame; abort() (or an
+    exception inside a with block) leaves the bundle without one, so it
+    fails to decrypt instead of passing as a complete, shorter payload.
+    """
+    
+    def __init__(self, out_file: BinaryIO, public_key_pem: bytes, original_filename: str = ''):
+        """
+        Args:
+            out_file: Writable binary file receiving the bundle
+            public_key_pem: RSA public key in PEM format
+            original_filename: Name recorded in the bundle metadata
+        """
+        cipher = default_cipher()
+        aes_key, self._iv, self._header = _build_bundle_header(public_key_pem, original_filename,
+                                                               None, cipher)
+        self._aead = _AEAD_CLASSES[cipher](aes_key)
+        self._out_file = out_file
+        self._buffer = bytearray()
+        self._frames = 0
+        self.closed = False
+        
+        out_file.write(self._header)
+    
+    def _write_frame(self, chunk: Union[bytes, bytearray, memoryview], is_last: bool) -> None:
+        nonce = _frame_nonce(self._iv, self._frames)
+        aad = self._header + (b'\x01' if is_last else b'\x00')
+        self._out_file.write(self._aead.encrypt(nonce, chunk, aad))
+        self._frames += 1
+    
+    def write(self, data: bytes) -> int:
+        if self.closed:
+            raise ValueError("write to closed BundleWriter")
+        
+        self._buffer += data
+        
+        # Hold back the last full frame: only close() knows which frame is
+        # final. Frames are encrypted from views into the buffer, which is
+        # compacted once per write rather than once per frame
+        offset = 0
+        with memoryview(self._buffer) as view:
+            while len(view) - offset > FRAME_SIZE:
+                with view[offset:offset + FRAME_SIZE] as chunk:
+                    self._write_frame(chunk, False)
+                offset += FRAME_SIZE
+        del self._buffer[:offset]
+        return len(data)
+    
+    def close(self) -> None:
+        if self.closed:
+            return
+        self._write_frame(self._buffer, True)
+        self._buffer.clear()
+        self.closed = True
+    
+    def abort(self) -> None:
+        """Close without writing the final frame, leaving an undecryptable bundle"""
+        self._buffer.clear()
+        self.closed = True
+    
+    def __enter__(self) -> 'BundleWriter':
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # A producer that failed midway must not get a valid, truncated bundle
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class BundleReader:
+    """
+    Readable file object that decrypts a bundle as it is read
+    
+    The counterpart of BundleWriter: consumers such as tarfile's streaming
+    modes read plaintext straight out of the bundle, with no intermediate
+    decrypted file or buffer. Each frame is authenticated before any of its
+    plaintext is returned. A truncated or tampered bundle raises CryptoError
+    from read(), so consumers must treat data read before the error as
+    untrusted.
+    """
+    
+    def __init__(self, in_file: BinaryIO, private_key_pem: bytes):
+        """
+        Args:
+            in_file: Readable binary file positioned at the start of the bundle
+            private_key_pem: RSA private key in PEM format
+        """
+        try:
+            iv, frame_size, encrypted_aes_key, metadata, self._header = _read_bundle_header(in_file)
+            cipher = _bundle_cipher(metadata)
+            aes_key = decrypt_aes_key_with_rsa(encrypted_aes_key, private_key_pem)
+        except CryptoError:
+            raise
+        except Exception as e:
+            # Malformed metadata JSON, or a key that cannot unwrap the bundle
+            logger.error(f"Failed to open bundle: {e}")
+            raise CryptoError(f"Failed to open bundle: {e}") from e
+        
+        self._aead = _AEAD_CLASSES[cipher](aes_key)
+        self._iv = iv
+        self._frame_iter = _iter_frames(in_file, frame_size + GCM_TAG_SIZE)
+        self._frames = 0
+        self._plaintext = b''
+        self._offset = 0
+        self.closed = False
+    
+    def _read_frame(self) -> bool:
+        """Decrypt the next frame into the buffer; False once the bundle is exhausted"""
+        frame, is_last = next(self._frame_iter, (None, True))
+        if frame is None:
+            return False
+        if not frame:
+            raise CryptoError("Encrypted bundle is truncated")
+        
+        nonce = _frame_nonce(self._iv, self._frames)
+        aad = self._header + (b'\x01' if is_last else b'\x00')
+        try:
+            self._plaintext = self._aead.decrypt(nonce, frame, aad)
+        except InvalidTag as e:
+            raise CryptoError("Bundle is corrupted or was tampered with") from e
+        self._offset = 0
+        self._frames += 1
+        return True
+    
+    def read(self, size: int = -1) -> bytes:
+        if self.closed:
+            raise ValueError("read from closed BundleReader")
+        
+        chunks = []
+        while size:
+            if self._offset == len(self._plaintext):
+                if not self._read_frame():
+                    break
+                continue
+            
+            end = len(self._plaintext) if size < 0 else min(self._offset + size, len(self._plaintext))
+            chunks.append(self._plaintext[self._offset:end])
+            if size > 0:
+                size -= end - self._offset
+            self._offset = end
+        return b''.join(chunks)
+    
+    def readable(self) -> bool:
+        return True
+    
+    def close(self) -> None:
+        self._plaintext = b''
+        self.closed = True
+    
+    def __enter__(self) -> 'BundleReader':
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
 
 
 def encrypt_file(file_path: str, public_key_path: str, output_path: str) -> str:
@@ -270,52 +731,37 @@ def encrypt_file(file_path: str, public_key_path: str, output_path: str) -> str:
     try:
         logger.info(f"Starting encryption of {file_path}")
         
-        # Read input file
-        with open(file_path, 'rb') as f:
-            file_data = f.read()
+        # Load public key
+        public_key_pem = Path(public_key_path).read_bytes()
         
-        logger.info(f"Read {len(file_data)} bytes from {file_path}")
+        _reject_same_file(file_path, output_path)
+        _ensure_parent_dirs(output_path)
         
-        # Load public key
-        with open(public_key_path, 'rb') as f:
-            public_key_pem = f.read()
-        
-        # Generate random AES key
-        aes_key = generate_aes_key()
-        
-        # Encrypt file with AES
-        encrypted_file, iv = encrypt_file_aes(file_data, aes_key)
-        
-        # Encrypt AES key with RSA
-        encrypted_aes_key = encrypt_aes_key_with_rsa(aes_key, public_key_pem)
-        
-        # Create encrypted bundle
-        bundle = {
-            'metadata': {
-                'original_filename': os.path.basename(file_path),
-                'original_size': len(file_data),
-                'encrypted_size': len(encrypted_file),
-                'algorithm': 'AES-256-GCM + RSA-4096',
-                'created_by': 'cloq_crypto_utils'
-            },
-            'encrypted_file': base64.b64encode(encrypted_file).decode('utf-8'),
-            'encrypted_aes_key': base64.b64encode(encrypted_aes_key).decode('utf-8'),
-            'iv': base64.b64encode(iv).decode('utf-8')
-        }
-        
-        # Save bundle
-        output_dir = os.path.dirname(output_path)
-        if output_dir:  # Only create directory if there's a directory path
-            os.makedirs(output_dir, exist_ok=True)
-        with open(output_path, 'w') as f:
-            json.dump(bundle, f, indent=2)
+        with open(file_path, 'rb') as in_file, open(output_path, 'wb') as out_file:
+            original_size = os.fstat(in_file.fileno()).st_size
+            logger.info(f"Read {original_size} bytes from {file_path}")
+            
+            cipher = default_cipher()
+            aes_key, iv, header = _build_bundle_header(
+                public_key_pem, os.path.basename(file_path), original_size, cipher
+            )
+            out_file.write(header)
+            
+            # Stream the frames straight into the bundle; map non-empty inputs
+            # so frames are sliced from the page cache instead of being copied
+            # into fresh bytes objects
+            if original_size:
+                with mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    encrypt_file_aes(mm, out_file, aes_key, iv, header, cipher=cipher)
+            else:
+                encrypt_file_aes(in_file, out_file, aes_key, iv, header, cipher=cipher)
         
         logger.info(f"✓ Encrypted bundle saved to {output_path}")
         return output_path
         
     except Exception as e:
-        logger.error(f"Failed to encrypt file: {str(e)}")
-        raise CryptoError(f"Failed to encrypt file: {str(e)}")
+        logger.error(f"Failed to encrypt file: {e}")
+        raise CryptoError(f"Failed to encrypt file: {e}") from e
 
 
 def decrypt_file(encrypted_bundle_path: str, private_key_path: str, output_path: str) -> str:
@@ -333,38 +779,120 @@ def decrypt_file(encrypted_bundle_path: str, private_key_path: str, output_path:
     try:
         logger.info(f"Starting decryption of {encrypted_bundle_path}")
         
-        # Load encrypted bundle
-        with open(encrypted_bundle_path, 'r') as f:
-            bundle = json.load(f)
-        
         # Load private key
-        with open(private_key_path, 'rb') as f:
-            private_key_pem = f.read()
+        private_key_pem = Path(private_key_path).read_bytes()
         
-        # Decode base64 components
-        encrypted_file = base64.b64decode(bundle['encrypted_file'])
-        encrypted_aes_key = base64.b64decode(bundle['encrypted_aes_key'])
-        iv = base64.b64decode(bundle['iv'])
+        _reject_same_file(encrypted_bundle_path, output_path)
+        _ensure_parent_dirs(output_path)
         
-        # Decrypt AES key
-        aes_key = decrypt_aes_key_with_rsa(encrypted_aes_key, private_key_pem)
-        
-        # Decrypt file
-        decrypted_file = decrypt_file_aes(encrypted_file, aes_key, iv)
-        
-        # Save decrypted file
-        output_dir = os.path.dirname(output_path)
-        if output_dir:  # Only create directory if there's a directory path
-            os.makedirs(output_dir, exist_ok=True)
-        with open(output_path, 'wb') as f:
-            f.write(decrypted_file)
+        with open(encrypted_bundle_path, 'rb') as in_file:
+            iv, frame_size, encrypted_aes_key, metadata, header = _read_bundle_header(in_file)
+            cipher = _bundle_cipher(metadata)
+            
+            # Decrypt AES key
+            aes_key = decrypt_aes_key_with_rsa(encrypted_aes_key, private_key_pem)
+            
+            # Decrypt file; never leave unauthenticated plaintext behind.
+            # The bundle is mapped so frames are sliced from the page cache
+            # instead of being read into fresh bytes objects
+            try:
+                with open(output_path, 'wb') as out_file, \
+                        mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                        memoryview(mm) as view, view[len(header):] as frames:
+                    decrypt_file_aes(frames, out_file, aes_key, iv, header, frame_size, cipher)
+            except Exception:
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                raise
         
         logger.info(f"✓ Decrypted file saved to {output_path}")
         return output_path
         
+    except InvalidTag as e:
+        logger.error("Failed to decrypt file: authentication tag mismatch")
+        raise CryptoError("Failed to decrypt file: bundle is corrupted or was tampered with") from e
     except Exception as e:
-        logger.error(f"Failed to decrypt file: {str(e)}")
-        raise CryptoError(f"Failed to decrypt file: {str(e)}")
+        logger.error(f"Failed to decrypt file: {e}")
+        raise CryptoError(f"Failed to decrypt file: {e}") from e
+
+
+class _DiscardWriter:
+    """Write sink that drops everything it is given"""
+    
+    def write(self, data: bytes) -> int:
+        return len(data)
+
+
+def verify_artifact(encrypted_bundle_path: str, private_key_path: str) -> bool:
+    """
+    Check that a bundle decrypts and authenticates, without writing plaintext
+    
+    Args:
+        encrypted_bundle_path: Path to encrypted bundle
+        private_key_path: Path to RSA private key
+        
+    Returns:
+        True if every frame authenticates under the bundle's key
+    """
+    try:
+        private_key_pem = Path(private_key_path).read_bytes()
+        
+        with open(encrypted_bundle_path, 'rb') as in_file:
+            iv, frame_size, encrypted_aes_key, metadata, header = _read_bundle_header(in_file)
+            cipher = _bundle_cipher(metadata)
+            aes_key = decrypt_aes_key_with_rsa(encrypted_aes_key, private_key_pem)
+            
+            # Same frame-by-frame check as decryption; plaintext is discarded
+            with mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                    memoryview(mm) as view, view[len(header):] as frames:
+                decrypt_file_aes(frames, _DiscardWriter(), aes_key, iv, header, frame_size, cipher)
+        
+        return True
+        
+    except (InvalidTag, CryptoError, ValueError) as e:
+        # ValueError: RSA unwrap failed, i.e. the bundle is for another key
+        logger.warning(f"Bundle failed verification: {str(e) or 'authentication tag mismatch'}")
+        return False
+    except Exception as e:
+        logger.error(f"Failed to verify bundle: {e}")
+        raise CryptoError(f"Failed to verify bundle: {e}") from e
+
+
+def encrypt_files(file_paths: List[str], public_key_path: str, output_dir: str,
+                  max_workers: Optional[int] = None) -> List[str]:
+    """
+    Encrypt many files in parallel, one process per CPU by default
+    
+    Each file gets its own AES key and bundle, so files are independent and
+    bulk cipher throughput scales with the number of cores.
+    
+    Args:
+        file_paths: Paths of files to encrypt
+        public_key_path: Path to RSA public key
+        output_dir: Directory to save encrypted bundles (<name>.cloq)
+        max_workers: Worker process count (defaults to os.cpu_count())
+        
+    Returns:
+        Paths to saved encrypted bundles, in the same order as file_paths
+    """
+    output_paths = [
+        os.path.join(output_dir, f"{os.path.basename(path)}.cloq") for path in file_paths
+    ]
+    if len(set(output_paths)) != len(output_paths):
+        raise CryptoError("Failed to encrypt files: input file names must be unique")
+    
+    logger.info(f"Encrypting {len(file_paths)} files into {output_dir}")
+    os.makedirs(output_dir, exist_ok=True)
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(encrypt_file, path, public_key_path, output_path)
+            for path, output_path in zip(file_paths, output_paths)
+        ]
+        results = [future.result() for future in futures]
+    
+    logger.info(f"✓ Encrypted {len(results)} files")
+    return results
 
 
 if __name__ == "__main__":
@@ -380,12 +908,10 @@ if __name__ == "__main__":
         os.makedirs(demo_dir, exist_ok=True)
         
         # 1. Generate keypair
-        print("\n1️⃣ Generating RSA keypair...")
-        private_key, public_key = generate_rsa_keypair()
-        
+        print("\n1️⃣ Loading or generating RSA keypair...")
         private_path = os.path.join(demo_dir, "demo_private.pem")
         public_path = os.path.join(demo_dir, "demo_public.pem")
-        save_keypair(private_key, public_key, private_path, public_path)
+        load_or_generate_keypair(private_path, public_path)
         
         # 2. Create sample file
         print("\n2️⃣ Creating sample file...")
@@ -421,13 +947,12 @@ if __name__ == "__main__":
         
         # 6. Show bundle structure
         print("\n6️⃣ Encrypted bundle structure:")
-        with open(encrypted_bundle, 'r') as f:
-            bundle_data = json.load(f)
+        bundle_metadata = read_bundle_metadata(encrypted_bundle)
         
-        print(f"  - Original filename: {bundle_data['metadata']['original_filename']}")
-        print(f"  - Original size: {bundle_data['metadata']['original_size']} bytes")
-        print(f"  - Encrypted size: {bundle_data['metadata']['encrypted_size']} bytes")
-        print(f"  - Algorithm: {bundle_data['metadata']['algorithm']}")
+        print(f"  - Original filename: {bundle_metadata['original_filename']}")
+        print(f"  - Original size: {bundle_metadata['original_size']} bytes")
+        print(f"  - Encrypted size: {bundle_metadata['encrypted_size']} bytes")
+        print(f"  - Algorithm: {bundle_metadata['algorithm']}")
         print(f"  - Bundle size: {os.path.getsize(encrypted_bundle)} bytes")
         
         print(f"\n🎉 Demo completed successfully!")
@@ -11,27 +11,156 @@ software distribution between vendors and enterprises.
 
 import os
 import uuid
+import hashlib
 import logging
 from pathlib import Path
-from typing import Dict
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
 
 from fastapi import FastAPI, HTTPException, UploadFile, File
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, FileResponse, Response
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+
+class JSONGZipMiddleware(GZipMiddleware):
+    """GZip API responses but pass encrypted bundle downloads through untouched"""
+    
+    async def __call__(self, scope, receive, send):
+        # Ciphertext is incompressible; compressing it only burns CPU
+        if scope["type"] == "http" and scope["path"].startswith("/download/"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Cloq Control Plane - MVP",
     description="Simple pass-through host for encrypted software bundles",
-    version="0.1.0"
+    version="0.1.0",
+    # Serialize JSON bodies with orjson instead of the stdlib encoder
+    default_response_class=ORJSONResponse
 )
+app.add_middleware(JSONGZipMiddleware, minimum_size=1024)
 
 # Storage configuration
 STORAGE_DIR = Path("src/cloq_cp/storage")
 STORAGE_DIR.mkdir(exist_ok=True)
+# Content index kept in storage, so every worker sees it and it survives
+# restarts: <sha256>.json names the artifact stored with that hash.
+# Created on the first upload rather than at import
+HASH_INDEX_DIR = STORAGE_DIR / "sha256"
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+
+class BundleFileResponse(FileResponse):
+    """FileResponse that streams bundles in 1 MiB reads instead of 64 KiB"""
+    
+    # Each read is a threadpool hop plus an ASGI send; MB-scale bundles
+    # need 16x fewer of both
+    chunk_size = DOWNLOAD_CHUNK_SIZE
+
+
+def _write_chunk(f, hasher, chunk: bytes) -> None:
+    """Write and hash one upload chunk (runs in the threadpool)"""
+    f.write(chunk)
+    hasher.update(chunk)
+
+
+def _lookup_hash(sha256: str) -> Optional[Dict[str, Any]]:
+    """
+    Find the stored artifact with the given content hash
+    
+    Returns:
+        Index entry with artifact_id and filename, or None if no live
+        artifact has this hash
+    """
+    try:
+        entry = orjson.loads((HASH_INDEX_DIR / f"{sha256}.json").read_bytes())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None
+    
+    # The artifact may have been removed from storage since it was indexed
+    if not (STORAGE_DIR / f"{entry['artifact_id']}.cloq").exists():
+        return None
+    return entry
+
+
+def _claim_hash(sha256: str, artifact_id: str, filename: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Record a newly stored artifact as the holder of its content hash
+    
+    The entry is written to a temp file and hard-linked into place, so
+    readers never see a partial entry and, when two workers store the same
+    bytes at once, exactly one of them wins.
+    
+    Returns:
+        None if the artifact now holds the hash, otherwise the entry of the
+        live artifact that already held it
+    """
+    entry_path = HASH_INDEX_DIR / f"{sha256}.json"
+    tmp_path = HASH_INDEX_DIR / f"{sha256}.{artifact_id}.tmp"
+    HASH_INDEX_DIR.mkdir(exist_ok=True)
+    tmp_path.write_bytes(orjson.dumps({"artifact_id": artifact_id, "filename": filename}))
+    try:
+        os.link(tmp_path, entry_path)
+    except FileExistsError:
+        existing = _lookup_hash(sha256)
+        if existing:
+            return existing
+        # Stale entry for an artifact that is gone; take it over
+        os.replace(tmp_path, entry_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return None
+
+
+def _deduplicated_response(existing: Dict[str, Any], file_size: int, sha256: str) -> Dict[str, Any]:
+    """Upload response pointing at an artifact that already holds these bytes"""
+    logger.info(f"📤 UPLOAD: deduplicated -> {existing['artifact_id']}")
+    logger.info(f"   Size: {file_size:,} bytes")
+    logger.info(f"   SHA-256: {sha256}")
+    
+    return {
+        "artifact_id": existing["artifact_id"],
+        "message": "Already stored",
+        "filename": existing["filename"],
+        "size_bytes": str(file_size),
+        "sha256": sha256,
+        "deduplicated": True
+    }
+
+
+def _scan_artifacts() -> List[Tuple[str, int]]:
+    """
+    List stored artifacts with a single directory scan
+    
+    Returns:
+        List of (artifact_id, size_bytes) tuples
+    """
+    artifacts = []
+    with os.scandir(STORAGE_DIR) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".cloq"):
+                continue
+            try:
+                size = entry.stat().st_size
+            except FileNotFoundError:
+                continue  # removed while we were scanning
+            artifacts.append((entry.name[:-len(".cloq")], size))
+    return artifacts
+
+
+# Serialized /list body, keyed by the storage directory mtime so files added
+# or removed outside the API also invalidate it
+_list_cache: Optional[Tuple[int, bytes]] = None
 
 
 @app.get("/")
@@ -48,8 +177,11 @@ async def root():
     }
 
 
-@app.post("/upload")
-async def upload_artifact(file: UploadFile = File(...)) -> Dict[str, str]:
+# The response dict is built entirely from server-generated values, so skip
+# the response model FastAPI would infer from the return annotation and its
+# per-request validation pass
+@app.post("/upload", response_model=None)
+async def upload_artifact(file: UploadFile = File(...)) -> Dict[str, Any]:
     """
     Upload an encrypted software bundle
     
@@ -57,34 +189,71 @@ async def upload_artifact(file: UploadFile = File(...)) -> Dict[str, str]:
         file: The encrypted bundle file to upload
         
     Returns:
-        JSON response with artifact ID and success message
+        JSON response with artifact ID, size, SHA-256 and success message;
+        ``deduplicated`` is true when identical bytes were already stored
     """
+    global _list_cache
+    
+    # Generate unique artifact ID
+    artifact_id = str(uuid.uuid4())
+    file_path = STORAGE_DIR / f"{artifact_id}.cloq"
+    part_path = STORAGE_DIR / f"{artifact_id}.cloq.part"
+    
     try:
-        # Generate unique artifact ID
-        artifact_id = str(uuid.uuid4())
+        # Stream the upload to storage in chunks, hashing as we go, so the
+        # whole bundle is never held in memory; disk writes and hashing run
+        # in the threadpool so they don't block the event loop
+        file_size = 0
+        hasher = hashlib.sha256()
+        f = await run_in_threadpool(open, part_path, 'wb')
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await run_in_threadpool(_write_chunk, f, hasher, chunk)
+                file_size += len(chunk)
+        finally:
+            await run_in_threadpool(f.close)
+        sha256 = hasher.hexdigest()
         
-        # Read file content
-        file_content = await file.read()
-        file_size = len(file_content)
+        # Same bytes already stored: drop the new copy and hand back the
+        # existing artifact instead of keeping a duplicate on disk
+        existing = await run_in_threadpool(_lookup_hash, sha256)
+        if existing:
+            part_path.unlink()
+            return _deduplicated_response(existing, file_size, sha256)
         
-        # Save file to storage
-        file_path = STORAGE_DIR / f"{artifact_id}.cloq"
-        with open(file_path, 'wb') as f:
-            f.write(file_content)
+        # Publish atomically: the artifact only becomes visible once complete,
+        # and the rename bumps the directory mtime that keys every worker's
+        # /list cache
+        os.replace(part_path, file_path)
+        
+        # Another worker may have stored the same bytes meanwhile; keep
+        # whichever artifact claimed the hash first
+        existing = await run_in_threadpool(_claim_hash, sha256, artifact_id, file.filename)
+        if existing:
+            file_path.unlink()
+            return _deduplicated_response(existing, file_size, sha256)
+        
+        # The cached listing no longer reflects storage
+        _list_cache = None
         
         # Log the upload
         logger.info(f"📤 UPLOAD: {file.filename} -> {artifact_id}")
         logger.info(f"   Size: {file_size:,} bytes")
+        logger.info(f"   SHA-256: {sha256}")
         logger.info(f"   Saved to: {file_path}")
         
         return {
             "artifact_id": artifact_id,
             "message": "Stored successfully",
             "filename": file.filename,
-            "size_bytes": str(file_size)
+            "size_bytes": str(file_size),
+            "sha256": sha256,
+            "deduplicated": False
         }
         
     except Exception as e:
+        # Don't leave a partially written artifact behind
+        part_path.unlink(missing_ok=True)
         logger.error(f"❌ Upload failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
@@ -104,13 +273,14 @@ async def download_artifact(artifact_id: str):
         # Construct file path
         file_path = STORAGE_DIR / f"{artifact_id}.cloq"
         
-        # Check if file exists
-        if not file_path.exists():
+        # Stat once: doubles as the existence check and is handed to
+        # FileResponse so it doesn't stat the file again
+        try:
+            file_stat = file_path.stat()
+        except FileNotFoundError:
             logger.warning(f"❌ DOWNLOAD: Artifact {artifact_id} not found")
             raise HTTPException(status_code=404, detail="Artifact not found")
-        
-        # Get file info
-        file_size = file_path.stat().st_size
+        file_size = file_stat.st_size
         
         # Log the download
         logger.info(f"📥 DOWNLOAD: {artifact_id}")
@@ -118,10 +288,11 @@ async def download_artifact(artifact_id: str):
         logger.info(f"   Path: {file_path}")
         
         # Return file as download
-        return FileResponse(
+        return BundleFileResponse(
             path=str(file_path),
             filename=f"{artifact_id}.cloq",
-            media_type="application/octet-stream"
+            media_type="application/octet-stream",
+            stat_result=file_stat
         )
         
     except HTTPException:
@@ -134,36 +305,42 @@ async def download_artifact(artifact_id: str):
 @app.get("/health")
 async def health_check():
     """Simple health check endpoint"""
-    storage_files = list(STORAGE_DIR.glob("*.cloq"))
+    artifacts = _scan_artifacts()
     
     return {
         "status": "healthy",
         "storage_directory": str(STORAGE_DIR),
-        "artifacts_count": len(storage_files),
-        "storage_size_bytes": sum(f.stat().st_size for f in storage_files)
+        "artifacts_count": len(artifacts),
+        "storage_size_bytes": sum(size for _, size in artifacts)
     }
 
 
 @app.get("/list")
 async def list_artifacts():
     """List all stored artifacts (for debugging)"""
-    artifacts = []
+    global _list_cache
     
-    for file_path in STORAGE_DIR.glob("*.cloq"):
-        artifact_id = file_path.stem  # Remove .cloq extension
-        file_size = file_path.stat().st_size
-        
-        artifacts.append({
+    storage_mtime = STORAGE_DIR.stat().st_mtime_ns
+    if _list_cache is not None and _list_cache[0] == storage_mtime:
+        return Response(_list_cache[1], media_type="application/json")
+    
+    artifacts = [
+        {
             "artifact_id": artifact_id,
             "size_bytes": file_size,
             "filename": f"{artifact_id}.cloq"
-        })
+        }
+        for artifact_id, file_size in _scan_artifacts()
+    ]
     
-    return {
+    body = orjson.dumps({
         "artifacts": artifacts,
         "count": len(artifacts),
         "total_size_bytes": sum(a["size_bytes"] for a in artifacts)
-    }
+    })
+    _list_cache = (storage_mtime, body)
+    
+    return Response(body, media_type="application/json")
 
 
 if __name__ == "__main__":
@@ -174,11 +351,19 @@ if __name__ == "__main__":
     print(f"📁 Storage directory: {STORAGE_DIR}")
     print(f"🌐 API will be available at: http://localhost:9000")
     print(f"📚 API docs available at: http://localhost:9000/docs")
+    
+    # Auto-reload only for local development (CLOQ_DEV=1); otherwise run one
+    # worker per core. uvicorn picks uvloop/httptools automatically when
+    # they are installed.
+    dev_mode = os.environ.get("CLOQ_DEV") == "1"
+    workers = None if dev_mode else int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+    print(f"⚙️  Mode: {'development (reload)' if dev_mode else f'production ({workers} workers)'}")
     print("=" * 50)
     
     uvicorn.run(
         "src.cloq_cp.main:app",
         host="0.0.0.0",
         port=9000,
-        reload=True
+        reload=dev_mode,
+        workers=workers
     )
\ No newline at end of file
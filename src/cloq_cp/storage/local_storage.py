@@ -3,36 +3,72 @@ Local Storage Module - File system storage for artifacts
 
 This module provides:
 - Local file system storage for artifacts
-- Artifact metadata management
+- Artifact metadata management (SQLite in WAL mode)
 - Storage abstraction for future cloud integration
 """
 
-import os
-import json
-import shutil
+import sqlite3
 from pathlib import Path
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
+import orjson
+
 
 class LocalStorage:
     """Local file system storage implementation"""
     
     def __init__(self, base_path: str = "artifacts"):
         self.base_path = Path(base_path)
-        self.metadata_path = self.base_path / "metadata.json"
+        self.db_path = self.base_path / "metadata.db"
+        self.metadata_path = self.base_path / "metadata.json"  # legacy store
         self._ensure_directories()
+        self._conn = self._connect()
+        self._migrate_legacy_metadata()
     
     def _ensure_directories(self):
         """Ensure storage directories exist"""
         self.base_path.mkdir(exist_ok=True)
-        
-        # Initialize metadata file if it doesn't exist
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the metadata database and create the schema if needed"""
+        # Autocommit mode: each upsert/delete is its own small transaction
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        
+        # WAL lets readers proceed while a write is in progress
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS artifacts (
+                artifact_id TEXT PRIMARY KEY,
+                vendor_id TEXT,
+                file_size INTEGER NOT NULL DEFAULT 0,
+                stored_at TEXT,
+                metadata BLOB NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_vendor ON artifacts (vendor_id)")
+        return conn
+    
+    def _migrate_legacy_metadata(self):
+        """Import a pre-SQLite metadata.json once, then move it aside"""
         if not self.metadata_path.exists():
-            with open(self.metadata_path, 'w') as f:
-                json.dump({}, f)
+            return
+        
+        try:
+            legacy_metadata = orjson.loads(self.metadata_path.read_bytes())
+        except orjson.JSONDecodeError:
+            legacy_metadata = {}
+        
+        with self._conn:
+            self._conn.execute("BEGIN")
+            for artifact_id, artifact_metadata in legacy_metadata.items():
+                self._update_metadata(artifact_id, artifact_metadata, replace=False)
+        
+        self.metadata_path.rename(self.metadata_path.with_suffix(".json.migrated"))
     
-    def store_artifact(self, artifact_id: str, file_data: bytes, 
+    def store_artifact(self, artifact_id: str, file_data: bytes,
                       metadata: Dict[str, Any]) -> str:
         """
         Store artifact file and metadata
@@ -88,8 +124,10 @@ class LocalStorage:
         Returns:
             Metadata dictionary or None if not found
         """
-        metadata = self._load_metadata()
-        return metadata.get(artifact_id)
+        row = self._conn.execute(
+            "SELECT metadata FROM artifacts WHERE artifact_id = ?", (artifact_id,)
+        ).fetchone()
+        return orjson.loads(row[0]) if row else None
     
     def list_artifacts(self, vendor_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
@@ -101,17 +139,21 @@ class LocalStorage:
         Returns:
             List of artifact metadata
         """
-        metadata = self._load_metadata()
-        
-        artifacts = []
-        for artifact_id, artifact_metadata in metadata.items():
-            if vendor_id is None or artifact_metadata.get('vendor_id') == vendor_id:
-                artifacts.append({
-                    'artifact_id': artifact_id,
-                    **artifact_metadata
-                })
-        
-        return artifacts
+        # The vendor filter is served by idx_artifacts_vendor
+        if vendor_id is None:
+            rows = self._conn.execute(
+                "SELECT artifact_id, metadata FROM artifacts ORDER BY rowid"
+            )
+        else:
+            rows = self._conn.execute(
+                "SELECT artifact_id, metadata FROM artifacts WHERE vendor_id = ? ORDER BY rowid",
+                (vendor_id,)
+            )
+        
+        return [
+            {'artifact_id': artifact_id, **orjson.loads(artifact_metadata)}
+            for artifact_id, artifact_metadata in rows
+        ]
     
     def delete_artifact(self, artifact_id: str) -> bool:
         """
@@ -129,44 +171,33 @@ class LocalStorage:
             file_path.unlink()
         
         # Delete metadata
-        metadata = self._load_metadata()
-        if artifact_id in metadata:
-            del metadata[artifact_id]
-            self._save_metadata(metadata)
-            return True
-        
-        return False
-    
-    def _load_metadata(self) -> Dict[str, Any]:
-        """Load metadata from file"""
-        try:
-            with open(self.metadata_path, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
+        cursor = self._conn.execute(
+            "DELETE FROM artifacts WHERE artifact_id = ?", (artifact_id,)
+        )
+        return cursor.rowcount > 0
     
-    def _save_metadata(self, metadata: Dict[str, Any]):
-        """Save metadata to file"""
-        with open(self.metadata_path, 'w') as f:
-            json.dump(metadata, f, indent=2)
-    
-    def _update_metadata(self, artifact_id: str, artifact_metadata: Dict[str, Any]):
-        """Update metadata for specific artifact"""
-        metadata = self._load_metadata()
-        metadata[artifact_id] = artifact_metadata
-        self._save_metadata(metadata)
+    def _update_metadata(self, artifact_id: str, artifact_metadata: Dict[str, Any],
+                         replace: bool = True):
+        """Upsert metadata for specific artifact"""
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        self._conn.execute(
+            f"{verb} INTO artifacts (artifact_id, vendor_id, file_size, stored_at, metadata) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                artifact_id,
+                artifact_metadata.get('vendor_id'),
+                artifact_metadata.get('file_size', 0),
+                artifact_metadata.get('stored_at'),
+                # orjson encodes straight to bytes, stored as-is in the BLOB column
+                orjson.dumps(artifact_metadata)
+            )
+        )
     
     def get_storage_stats(self) -> Dict[str, Any]:
         """Get storage statistics"""
-        metadata = self._load_metadata()
-        
-        total_size = 0
-        file_count = 0
-        
-        for artifact_metadata in metadata.values():
-            file_size = artifact_metadata.get('file_size', 0)
-            total_size += file_size
-            file_count += 1
+        file_count, total_size = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(file_size), 0) FROM artifacts"
+        ).fetchone()
         
         return {
             "total_artifacts": file_count,
@@ -174,3 +205,7 @@ class LocalStorage:
             "total_size_mb": round(total_size / (1024 * 1024), 2),
             "storage_path": str(self.base_path)
         }
+    
+    def close(self):
+        """Close the metadata database connection"""
+        self._conn.close()
@@ -9,23 +9,26 @@ This CLI allows enterprise clients to:
 - Validate artifact integrity
 """
 
-import sys
 import os
+import sys
 import argparse
+import tempfile
 from pathlib import Path
 
 # Add the project root to Python path for imports
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
-from src.cloq_cp.crypto_utils import decrypt_file
+from src.cloq_cp.crypto_utils import decrypt_file, verify_artifact, CryptoError
+from src.cloq_cp.client import ControlPlaneClient, ControlPlaneError, DEFAULT_CONTROL_PLANE_URL
 
 
 class EnterpriseCLI:
     """Enterprise command-line interface"""
     
     def __init__(self):
-        self.control_plane_url = "http://localhost:8000"  # Default CP URL
+        self.control_plane_url = DEFAULT_CONTROL_PLANE_URL
+        self.client = ControlPlaneClient(self.control_plane_url)
     
     def download_and_decrypt(self, artifact_id: str, private_key_path: str, 
                            output_path: str = None) -> str:
@@ -42,22 +45,17 @@ class EnterpriseCLI:
         """
         print(f"📥 Downloading artifact: {artifact_id}")
         
-        # TODO: Download from control plane
-        print("⚠️  Control plane download not yet implemented")
-        print("📁 Using local artifact file for demo...")
-        
-        # For demo purposes, assume artifact file exists locally
-        artifact_path = f"artifacts/{artifact_id}.cloq"
-        
-        if not os.path.exists(artifact_path):
-            print(f"❌ Artifact file not found: {artifact_path}")
-            return None
-        
-        print(f"🔓 Decrypting artifact: {artifact_path}")
-        
-        # Decrypt artifact
+        # The ciphertext only lives in a scratch directory that is removed
+        # afterwards; the artifact ID never becomes part of a local path
         decrypted_path = output_path or "decrypted_file"
-        decrypt_file(artifact_path, private_key_path, decrypted_path)
+        with tempfile.TemporaryDirectory(prefix="cloq_download_") as download_dir:
+            artifact_path = os.path.join(download_dir, "artifact.cloq")
+            self.client.download(artifact_id, artifact_path)
+            
+            print(f"🔓 Decrypting artifact: {artifact_id}")
+            
+            # Decrypt artifact
+            decrypt_file(artifact_path, private_key_path, decrypted_path)
         
         print(f"✅ File decrypted: {decrypted_path}")
         return decrypted_path
@@ -65,7 +63,11 @@ class EnterpriseCLI:
     def list_available_artifacts(self):
         """List available artifacts for download"""
         print("📋 Listing available artifacts...")
-        print("⚠️  Artifact listing not yet implemented")
+        list_data = self.client.list_artifacts()
+        
+        for artifact in list_data['artifacts']:
+            print(f"  - {artifact['artifact_id']} ({artifact['size_bytes']:,} bytes)")
+        print(f"📊 Total artifacts: {list_data['count']}")
     
     def validate_artifact(self, artifact_path: str, private_key_path: str) -> bool:
         """
@@ -81,16 +83,8 @@ class EnterpriseCLI:
         print(f"🔍 Validating artifact: {artifact_path}")
         
         try:
-            # Try to decrypt and validate
-            temp_path = "temp_validation_file"
-            decrypt_file(artifact_path, private_key_path, temp_path)
-            
-            # Check if decryption was successful
-            is_valid = os.path.exists(temp_path)
-            
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+            # Authenticate every frame in memory; no plaintext touches disk
+            is_valid = verify_artifact(artifact_path, private_key_path)
             
             if is_valid:
                 print("✅ Artifact validation successful")
@@ -133,25 +127,30 @@ def main():
     
     cli = EnterpriseCLI()
     
-    if args.command == 'download':
-        decrypted_path = cli.download_and_decrypt(
-            args.artifact_id, 
-            args.private_key, 
-            args.output
-        )
-        if decrypted_path:
-            print(f"🎉 Download and decrypt successful! File: {decrypted_path}")
-    
-    elif args.command == 'list':
-        cli.list_available_artifacts()
+    try:
+        if args.command == 'download':
+            decrypted_path = cli.download_and_decrypt(
+                args.artifact_id, 
+                args.private_key, 
+                args.output
+            )
+            if decrypted_path:
+                print(f"🎉 Download and decrypt successful! File: {decrypted_path}")
+        
+        elif args.command == 'list':
+            cli.list_available_artifacts()
+        
+        elif args.command == 'validate':
+            is_valid = cli.validate_artifact(args.artifact_path, args.private_key)
+            if is_valid:
+                print("🎉 Artifact validation successful!")
+            else:
+                print("❌ Artifact validation failed!")
+                sys.exit(1)
     
-    elif args.command == 'validate':
-        is_valid = cli.validate_artifact(args.artifact_path, args.private_key)
-        if is_valid:
-            print("🎉 Artifact validation successful!")
-        else:
-            print("❌ Artifact validation failed!")
-            sys.exit(1)
+    except (ControlPlaneError, CryptoError) as e:
+        print(f"❌ {str(e)}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
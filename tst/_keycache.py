@@ -0,0 +1,36 @@
+"""
+Shared RSA keypair for the test scripts
+
+RSA keygen is the slowest step of every workflow test, so the keypair is
+generated once, persisted under ~/.cache/cloq-tests (override with
+CLOQ_TEST_KEY_CACHE) and reused by later tests and later runs.
+"""
+
+import os
+import functools
+from pathlib import Path
+from typing import Tuple
+
+import _testpath  # noqa: F401  (adds the project root to sys.path)
+
+from src.cloq_cp.crypto_utils import load_or_generate_keypair
+
+KEY_CACHE_DIR = Path(os.environ.get("CLOQ_TEST_KEY_CACHE", Path.home() / ".cache" / "cloq-tests"))
+
+
+@functools.lru_cache(maxsize=None)
+def get_test_keypair(key_size: int = 4096) -> Tuple[bytes, bytes]:
+    """
+    Get the cached test keypair, generating it on first use
+
+    Args:
+        key_size: RSA key size in bits
+
+    Returns:
+        Tuple of (private_key_pem, public_key_pem) as bytes
+    """
+    return load_or_generate_keypair(
+        str(KEY_CACHE_DIR / f"private-{key_size}.pem"),
+        str(KEY_CACHE_DIR / f"public-{key_size}.pem"),
+        key_size
+    )
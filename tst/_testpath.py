@@ -0,0 +1,21 @@
+"""
+Common setup for the test scripts
+
+Importing this module puts the project root on sys.path (once per process,
+however many test modules import it) and, on Linux, points tempfile at the
+RAM-backed /dev/shm so short-lived test artifacts never hit the disk.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+project_root = str(Path(__file__).resolve().parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# An explicit TMPDIR still wins
+if (sys.platform == "linux" and "TMPDIR" not in os.environ
+        and os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK)):
+    tempfile.tempdir = "/dev/shm"
@@ -11,17 +11,56 @@ This test demonstrates the basic control plane functionality:
 This shows the control plane acting as a neutral pass-through host.
 """
 
+import io
+import hashlib
 import requests
 import tempfile
 import os
 import sys
-from pathlib import Path
 
-# Add the project root to Python path for imports
-project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
+import _testpath  # noqa: F401  (adds the project root to sys.path)
 
-from src.cloq_cp.crypto_utils import encrypt_file, decrypt_file, generate_rsa_keypair, save_keypair
+from src.cloq_cp.crypto_utils import encrypt_file, decrypt_file, save_keypair
+from src.cloq_cp.client import ControlPlaneClient, ControlPlaneError
+from _keycache import get_test_keypair
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+
+def sha256_file(path: str) -> bytes:
+    """Hash a file in CHUNK_SIZE reads and return the raw SHA-256 digest"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.digest()
+
+
+def download_to_file(session: requests.Session, url: str, output_path: str):
+    """
+    Stream a download to a file, hashing it on the way
+    
+    Args:
+        session: Session to issue the request with
+        url: Download URL
+        output_path: Where to save the body
+        
+    Returns:
+        (response, size, sha256); size and sha256 are None if the request failed
+    """
+    with session.get(url, stream=True) as response:
+        if response.status_code != 200:
+            return response, None, None
+        
+        size = 0
+        hasher = hashlib.sha256()
+        with open(output_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                hasher.update(chunk)
+                size += len(chunk)
+        
+        return response, size, hasher.hexdigest()
 
 
 def test_control_plane_api():
@@ -32,10 +71,13 @@ def test_control_plane_api():
     # Control plane base URL
     base_url = "http://localhost:9000"
     
+    # One keep-alive connection for every request in the test
+    session = requests.Session()
+    
     try:
         # 1. Check if control plane is running
         print("1️⃣ Checking control plane health...")
-        response = requests.get(f"{base_url}/health", timeout=5)
+        response = session.get(f"{base_url}/health", timeout=5)
         if response.status_code == 200:
             health_data = response.json()
             print(f"✅ Control plane is healthy")
@@ -45,22 +87,18 @@ def test_control_plane_api():
             print(f"❌ Control plane health check failed: {response.status_code}")
             return False
         
-        # 2. Create a test file
-        print("\n2️⃣ Creating test file...")
+        # 2. Create test content in memory
+        print("\n2️⃣ Creating test content...")
         test_content = "This is a test encrypted bundle for the Cloq control plane!\nIt contains sensitive software data that needs to be protected."
+        test_bytes = test_content.encode('utf-8')
         
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.txt') as f:
-            f.write(test_content)
-            test_file_path = f.name
-        
-        print(f"✅ Test file created: {test_file_path}")
+        print(f"✅ Test content created: {len(test_bytes)} bytes")
         
-        # 3. Upload file to control plane
+        # 3. Upload content to control plane
         print("\n3️⃣ Uploading file to control plane...")
         
-        with open(test_file_path, 'rb') as f:
-            files = {'file': ('test_bundle.txt', f, 'text/plain')}
-            response = requests.post(f"{base_url}/upload", files=files)
+        files = {'file': ('test_bundle.txt', io.BytesIO(test_bytes), 'text/plain')}
+        response = session.post(f"{base_url}/upload", files=files)
         
         if response.status_code == 200:
             upload_data = response.json()
@@ -75,17 +113,14 @@ def test_control_plane_api():
         # 4. Download file from control plane
         print("\n4️⃣ Downloading file from control plane...")
         
-        response = requests.get(f"{base_url}/download/{artifact_id}")
+        # The test payload is tiny, so keep it in memory rather than
+        # round-tripping it through a temp file
+        response = session.get(f"{base_url}/download/{artifact_id}")
         
         if response.status_code == 200:
-            # Save downloaded content
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.downloaded.txt') as f:
-                f.write(response.content)
-                downloaded_file_path = f.name
-            
+            downloaded_bytes = response.content
             print(f"✅ File downloaded successfully!")
-            print(f"   Size: {len(response.content)} bytes")
-            print(f"   Saved to: {downloaded_file_path}")
+            print(f"   Size: {len(downloaded_bytes)} bytes")
         else:
             print(f"❌ Download failed: {response.status_code} - {response.text}")
             return False
@@ -93,19 +128,33 @@ def test_control_plane_api():
         # 5. Verify file integrity
         print("\n5️⃣ Verifying file integrity...")
         
-        with open(downloaded_file_path, 'r') as f:
-            downloaded_content = f.read()
-        
-        if downloaded_content == test_content:
+        if downloaded_bytes == test_bytes:
             print("✅ File integrity verified! Content matches exactly.")
         else:
             print("❌ File integrity check failed! Content mismatch.")
             return False
         
-        # 6. Check artifact list
-        print("\n6️⃣ Checking artifact list...")
+        # 6. Re-upload the same bytes under another name
+        print("\n6️⃣ Re-uploading identical content...")
+        
+        files = {'file': ('renamed_bundle.txt', io.BytesIO(test_bytes), 'text/plain')}
+        response = session.post(f"{base_url}/upload", files=files)
+        
+        if response.status_code != 200:
+            print(f"❌ Re-upload failed: {response.status_code} - {response.text}")
+            return False
+        
+        dedup_data = response.json()
+        if (not dedup_data['deduplicated'] or dedup_data['artifact_id'] != artifact_id
+                or dedup_data['filename'] != 'test_bundle.txt'):
+            print(f"❌ Re-upload was not deduplicated to the stored artifact: {dedup_data}")
+            return False
+        print(f"✅ Re-upload deduplicated to {artifact_id}")
+        
+        # 7. Check artifact list
+        print("\n7️⃣ Checking artifact list...")
         
-        response = requests.get(f"{base_url}/list")
+        response = session.get(f"{base_url}/list")
         if response.status_code == 200:
             list_data = response.json()
             print(f"✅ Artifact list retrieved")
@@ -114,18 +163,13 @@ def test_control_plane_api():
         else:
             print(f"❌ List request failed: {response.status_code}")
         
-        # Cleanup
-        print("\n🧹 Cleaning up test files...")
-        os.unlink(test_file_path)
-        os.unlink(downloaded_file_path)
-        print("✅ Test files cleaned up")
-        
         print("\n🎉 Control plane API test completed successfully!")
         print("\n📋 SUMMARY:")
         print("  ✅ Control plane health check passed")
         print("  ✅ File upload successful")
         print("  ✅ File download successful")
         print("  ✅ File integrity verified")
+        print("  ✅ Duplicate upload deduplicated")
         print("  ✅ Artifact listing works")
         
         return True
@@ -139,6 +183,8 @@ def test_control_plane_api():
         import traceback
         traceback.print_exc()
         return False
+    finally:
+        session.close()
 
 
 def test_encrypted_workflow():
@@ -148,93 +194,80 @@ def test_encrypted_workflow():
     
     base_url = "http://localhost:9000"
     
+    # Upload through the client, and reuse its keep-alive session for
+    # every other request in the test
+    client = ControlPlaneClient(base_url)
+    session = client.session
+    
     try:
-        # 1. Generate encryption keys
-        print("1️⃣ Generating encryption keys...")
-        private_key, public_key = generate_rsa_keypair()
-        
-        keys_dir = "test_keys"
-        os.makedirs(keys_dir, exist_ok=True)
-        private_key_path = os.path.join(keys_dir, "test_private.pem")
-        public_key_path = os.path.join(keys_dir, "test_public.pem")
-        
-        save_keypair(private_key, public_key, private_key_path, public_key_path)
-        print(f"✅ Keys generated and saved to {keys_dir}/")
-        
-        # 2. Create and encrypt a file
-        print("\n2️⃣ Creating and encrypting test file...")
-        
-        test_content = "Secret software package data!\nThis would normally contain executable code."
-        
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.txt') as f:
-            f.write(test_content)
-            original_file_path = f.name
-        
-        # Encrypt the file
-        encrypted_bundle_path = "test_encrypted.clq"
-        encrypt_file(original_file_path, public_key_path, encrypted_bundle_path)
-        print(f"✅ File encrypted: {encrypted_bundle_path}")
-        
-        # 3. Upload encrypted bundle to control plane
-        print("\n3️⃣ Uploading encrypted bundle...")
-        
-        with open(encrypted_bundle_path, 'rb') as f:
-            files = {'file': ('encrypted_bundle.clq', f, 'application/octet-stream')}
-            response = requests.post(f"{base_url}/upload", files=files)
-        
-        if response.status_code == 200:
-            upload_data = response.json()
+        # Every file the test writes lives here and is removed on exit,
+        # pass or fail
+        with tempfile.TemporaryDirectory(prefix="cloq_test_") as work_dir:
+            # 1. Generate encryption keys
+            print("1️⃣ Loading encryption keys...")
+            private_key, public_key = get_test_keypair()
+            
+            private_key_path = os.path.join(work_dir, "test_private.pem")
+            public_key_path = os.path.join(work_dir, "test_public.pem")
+            
+            save_keypair(private_key, public_key, private_key_path, public_key_path)
+            print(f"✅ Keys saved to {work_dir}/")
+            
+            # 2. Create and encrypt a file
+            print("\n2️⃣ Creating and encrypting test file...")
+            
+            test_content = "Secret software package data!\nThis would normally contain executable code."
+            
+            original_file_path = os.path.join(work_dir, "test_original.txt")
+            with open(original_file_path, 'w') as f:
+                f.write(test_content)
+            
+            # Encrypt the file
+            encrypted_bundle_path = os.path.join(work_dir, "test_encrypted.clq")
+            encrypt_file(original_file_path, public_key_path, encrypted_bundle_path)
+            print(f"✅ File encrypted: {encrypted_bundle_path}")
+            
+            # 3. Upload encrypted bundle to control plane
+            print("\n3️⃣ Uploading encrypted bundle...")
+            
+            try:
+                upload_data = client.upload(encrypted_bundle_path)
+            except ControlPlaneError as e:
+                print(f"❌ Upload failed: {e}")
+                return False
+            
             artifact_id = upload_data['artifact_id']
             print(f"✅ Encrypted bundle uploaded!")
             print(f"   Artifact ID: {artifact_id}")
-        else:
-            print(f"❌ Upload failed: {response.status_code}")
-            return False
-        
-        # 4. Download encrypted bundle from control plane
-        print("\n4️⃣ Downloading encrypted bundle...")
-        
-        response = requests.get(f"{base_url}/download/{artifact_id}")
-        
-        if response.status_code == 200:
-            # Save downloaded bundle
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.downloaded.clq') as f:
-                f.write(response.content)
-                downloaded_bundle_path = f.name
             
-            print(f"✅ Encrypted bundle downloaded!")
-        else:
-            print(f"❌ Download failed: {response.status_code}")
-            return False
-        
-        # 5. Decrypt and verify
-        print("\n5️⃣ Decrypting and verifying...")
-        
-        decrypted_file_path = "test_decrypted.txt"
-        decrypt_file(downloaded_bundle_path, private_key_path, decrypted_file_path)
-        
-        with open(decrypted_file_path, 'r') as f:
-            decrypted_content = f.read()
-        
-        if decrypted_content == test_content:
-            print("✅ Decryption successful! Content matches original.")
-        else:
-            print("❌ Decryption failed! Content mismatch.")
-            return False
-        
-        # Cleanup
-        print("\n🧹 Cleaning up...")
-        cleanup_files = [
-            original_file_path, encrypted_bundle_path, 
-            downloaded_bundle_path, decrypted_file_path
-        ]
-        for file_path in cleanup_files:
-            if os.path.exists(file_path):
-                os.unlink(file_path)
-        
-        import shutil
-        shutil.rmtree(keys_dir)
-        print("✅ Cleanup completed")
+            # 4. Download encrypted bundle from control plane
+            print("\n4️⃣ Downloading encrypted bundle...")
+            
+            downloaded_bundle_path = os.path.join(work_dir, "test_downloaded.clq")
+            response, _, downloaded_sha256 = download_to_file(
+                session, f"{base_url}/download/{artifact_id}", downloaded_bundle_path
+            )
+            
+            if response.status_code == 200:
+                if downloaded_sha256 != upload_data['sha256']:
+                    print("❌ Downloaded bundle does not match the uploaded one")
+                    return False
+                print(f"✅ Encrypted bundle downloaded!")
+            else:
+                print(f"❌ Download failed: {response.status_code}")
+                return False
+            
+            # 5. Decrypt and verify
+            print("\n5️⃣ Decrypting and verifying...")
+            
+            decrypted_file_path = os.path.join(work_dir, "test_decrypted.txt")
+            decrypt_file(downloaded_bundle_path, private_key_path, decrypted_file_path)
+            
+            if sha256_file(decrypted_file_path) == hashlib.sha256(test_content.encode('utf-8')).digest():
+                print("✅ Decryption successful! Content matches original.")
+            else:
+                print("❌ Decryption failed! Content mismatch.")
+                return False
         
         print("\n🎉 Encrypted workflow test completed successfully!")
         print("📋 This demonstrates the complete Cloq workflow:")
@@ -251,6 +284,8 @@ def test_encrypted_workflow():
         import traceback
         traceback.print_exc()
         return False
+    finally:
+        session.close()
 
 
 if __name__ == "__main__":
@@ -13,30 +13,41 @@ This demonstrates that encrypted software packages maintain their functionality
 even when the entire codebase is encrypted and pre-built.
 """
 
+import io
 import os
+import functools
 import sys
-import json
+import math
 import tempfile
 import shutil
+import subprocess
 from pathlib import Path
+from typing import Optional
 
-# Add the project root to Python path for imports
-project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
+import orjson
 
-from src.cloq_cp.crypto_utils import (
-    generate_rsa_keypair, 
-    save_keypair, 
-    encrypt_file, 
-    decrypt_file
-)
+import _testpath  # noqa: F401  (adds the project root to sys.path)
+
+from src.cloq_cp.crypto_utils import BundleReader, BundleWriter
+from _keycache import get_test_keypair
+
+
+TAR_COPY_BUFSIZE = 2 * 1024 * 1024  # tarfile's default is 16 KiB
+CALCULATOR_TEMPLATE = Path(__file__).parent / "fixtures" / "calculator_template.py"
+
+
+@functools.lru_cache(maxsize=1)
+def calculator_source() -> bytes:
+    """Read the vendor calculator script once per process"""
+    return CALCULATOR_TEMPLATE.read_bytes()
 
 
 class SoftwarePackage:
     """Simulates a vendor's software package with built artifacts"""
     
-    def __init__(self, package_name: str):
+    def __init__(self, package_name: str, scratch_dir: Optional[str] = None):
         self.package_name = package_name
+        self.scratch_dir = scratch_dir
         self.temp_dir = None
         self.package_dir = None
         self.main_script = None
@@ -47,134 +58,30 @@ class SoftwarePackage:
         """Create a complete software package with functionality"""
         print(f"📦 Creating software package: {self.package_name}")
         
-        # Create temporary directory for package
-        self.temp_dir = tempfile.mkdtemp(prefix=f"{self.package_name}_")
+        # Create temporary directory for package, inside the caller's
+        # scratch directory when one was given
+        if self.scratch_dir:
+            self.temp_dir = os.path.join(self.scratch_dir, "vendor")
+        else:
+            self.temp_dir = tempfile.mkdtemp(prefix=f"{self.package_name}_")
         self.package_dir = os.path.join(self.temp_dir, self.package_name)
         os.makedirs(self.package_dir, exist_ok=True)
         
         # Create main functionality script
         self.main_script = os.path.join(self.package_dir, "calculator.py")
-        with open(self.main_script, 'w') as f:
-            f.write('''#!/usr/bin/env python3
-"""
-Advanced Calculator - Vendor Software Package
-This simulates a complex software package with multiple functionalities
-"""
-
-import json
-import os
-from datetime import datetime
-
-class AdvancedCalculator:
-    """Advanced calculator with multiple operations"""
-    
-    def __init__(self, config_file="config.json"):
-        self.config_file = config_file
-        self.load_config()
-        self.operation_history = []
-    
-    def load_config(self):
-        """Load configuration from file"""
-        try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r') as f:
-                    self.config = json.load(f)
-            else:
-                self.config = {"precision": 10, "log_operations": True}
-        except Exception as e:
-            self.config = {"precision": 10, "log_operations": True}
-            print(f"Warning: Could not load config: {e}")
-    
-    def add(self, a, b):
-        """Add two numbers"""
-        result = a + b
-        self._log_operation("add", a, b, result)
-        return round(result, self.config.get("precision", 10))
-    
-    def multiply(self, a, b):
-        """Multiply two numbers"""
-        result = a * b
-        self._log_operation("multiply", a, b, result)
-        return round(result, self.config.get("precision", 10))
-    
-    def power(self, base, exponent):
-        """Calculate base raised to exponent"""
-        result = base ** exponent
-        self._log_operation("power", base, exponent, result)
-        return round(result, self.config.get("precision", 10))
-    
-    def fibonacci(self, n):
-        """Calculate nth Fibonacci number"""
-        if n <= 0:
-            return 0
-        elif n == 1:
-            return 1
-        else:
-            a, b = 0, 1
-            for _ in range(2, n + 1):
-                a, b = b, a + b
-            self._log_operation("fibonacci", n, None, b)
-            return b
-    
-    def _log_operation(self, operation, a, b, result):
-        """Log operation to history"""
-        if self.config.get("log_operations", True):
-            timestamp = datetime.now().isoformat()
-            log_entry = {
-                "timestamp": timestamp,
-                "operation": operation,
-                "operands": [a, b] if b is not None else [a],
-                "result": result
-            }
-            self.operation_history.append(log_entry)
-    
-    def get_history(self):
-        """Get operation history"""
-        return self.operation_history
-    
-    def clear_history(self):
-        """Clear operation history"""
-        self.operation_history = []
-    
-    def run_demo(self):
-        """Run a demonstration of calculator functionality"""
-        print("🧮 Advanced Calculator Demo")
-        print("=" * 40)
-        
-        # Test basic operations
-        print(f"Addition: 15 + 27 = {self.add(15, 27)}")
-        print(f"Multiplication: 8 * 12 = {self.multiply(8, 12)}")
-        print(f"Power: 2^10 = {self.power(2, 10)}")
-        print(f"Fibonacci(10) = {self.fibonacci(10)}")
-        
-        # Test with decimals
-        print(f"Decimal add: 3.14159 + 2.71828 = {self.add(3.14159, 2.71828)}")
-        
-        print("\\n📊 Operation History:")
-        for entry in self.operation_history:
-            print(f"  {entry['timestamp']}: {entry['operation']}({entry['operands']}) = {entry['result']}")
-        
-        return self.operation_history
-
-def main():
-    """Main entry point for the calculator"""
-    calc = AdvancedCalculator()
-    return calc.run_demo()
-
-if __name__ == "__main__":
-    main()
-''')
+        with open(self.main_script, 'wb') as f:
+            f.write(calculator_source())
         
         # Create configuration file
         self.config_file = os.path.join(self.package_dir, "config.json")
-        with open(self.config_file, 'w') as f:
-            json.dump({
+        with open(self.config_file, 'wb') as f:
+            f.write(orjson.dumps({
                 "precision": 8,
                 "log_operations": True,
                 "package_name": self.package_name,
                 "version": "1.0.0",
                 "vendor": "DemoVendor Inc."
-            }, f, indent=2)
+            }, option=orjson.OPT_INDENT_2))
         
         # Create data file
         self.data_file = os.path.join(self.package_dir, "data.txt")
@@ -194,8 +101,8 @@ Test values: [1, 2, 3, 5, 8, 13, 21, 34, 55, 89]
         
         # Create package info file
         package_info = os.path.join(self.package_dir, "package_info.json")
-        with open(package_info, 'w') as f:
-            json.dump({
+        with open(package_info, 'wb') as f:
+            f.write(orjson.dumps({
                 "name": self.package_name,
                 "version": "1.0.0",
                 "description": "Advanced Calculator Package",
@@ -203,28 +110,36 @@ Test values: [1, 2, 3, 5, 8, 13, 21, 34, 55, 89]
                 "dependencies": [],
                 "build_date": "2025-10-18",
                 "vendor": "DemoVendor Inc."
-            }, f, indent=2)
+            }, option=orjson.OPT_INDENT_2))
         
         print(f"✅ Package created in: {self.package_dir}")
         return self.package_dir
     
-    def create_tarball(self):
-        """Create a tarball of the package for encryption"""
+    def write_tarball(self, fileobj):
+        """Stream a .tar.gz of the package into a writable file object"""
+        import gzip
         import tarfile
         
-        tarball_path = os.path.join(self.temp_dir, f"{self.package_name}.tar.gz")
-        
-        with tarfile.open(tarball_path, "w:gz") as tar:
+        # Fastest gzip level and a streaming (non-seekable) tar writer; the
+        # tarball only has to survive the round trip, not be small
+        with gzip.GzipFile(fileobj=fileobj, mode="wb", compresslevel=1) as gz, \
+                tarfile.open(fileobj=gz, mode="w|", copybufsize=TAR_COPY_BUFSIZE) as tar:
             tar.add(self.package_dir, arcname=self.package_name)
         
-        print(f"📦 Tarball created: {tarball_path}")
-        return tarball_path
+        print(f"📦 Tarball streamed: {self.package_name}.tar.gz")
     
     def cleanup(self):
         """Clean up temporary files"""
         if self.temp_dir and os.path.exists(self.temp_dir):
             shutil.rmtree(self.temp_dir)
             print(f"🧹 Cleaned up: {self.temp_dir}")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Runs on failure too, so a broken test never leaks the package dir
+        self.cleanup()
 
 
 def test_full_workflow():
@@ -237,69 +152,64 @@ def test_full_workflow():
         print("\\n🏭 VENDOR SIDE - Creating and Encrypting Software Package")
         print("-" * 60)
         
-        # 1. Create software package
-        package = SoftwarePackage("advanced_calculator")
-        package_dir = package.create_package()
-        tarball_path = package.create_tarball()
-        
-        # 2. Generate encryption keys
-        print("\\n🔑 Generating encryption keys...")
-        private_key, public_key = generate_rsa_keypair()
-        
-        keys_dir = "test_keys"
-        os.makedirs(keys_dir, exist_ok=True)
-        private_key_path = os.path.join(keys_dir, "vendor_private.pem")
-        public_key_path = os.path.join(keys_dir, "vendor_public.pem")
-        
-        save_keypair(private_key, public_key, private_key_path, public_key_path)
-        print(f"✅ Keys saved to {keys_dir}/")
-        
-        # 3. Encrypt the software package
-        print("\\n🔒 Encrypting software package...")
-        encrypted_bundle_path = f"{package.package_name}.encrypted.clq"
-        encrypt_file(tarball_path, public_key_path, encrypted_bundle_path)
-        
-        print(f"✅ Encrypted package: {encrypted_bundle_path}")
-        print(f"📊 Original size: {os.path.getsize(tarball_path)} bytes")
-        print(f"📊 Encrypted size: {os.path.getsize(encrypted_bundle_path)} bytes")
-        
-        # === ENTERPRISE SIDE ===
-        print("\\n\\n🏢 ENTERPRISE SIDE - Decrypting and Running Software")
-        print("-" * 60)
-        
-        # 4. Enterprise decrypts the package
-        print("\\n🔓 Decrypting software package...")
-        decrypted_tarball_path = f"{package.package_name}_decrypted.tar.gz"
-        decrypt_file(encrypted_bundle_path, private_key_path, decrypted_tarball_path)
-        
-        print(f"✅ Decrypted package: {decrypted_tarball_path}")
-        
-        # 5. Extract and run the software
-        print("\\n📂 Extracting and running decrypted software...")
-        
-        enterprise_temp_dir = tempfile.mkdtemp(prefix="enterprise_")
-        extracted_dir = os.path.join(enterprise_temp_dir, package.package_name)
-        
-        import tarfile
-        with tarfile.open(decrypted_tarball_path, "r:gz") as tar:
-            tar.extractall(enterprise_temp_dir)
-        
-        print(f"✅ Extracted to: {extracted_dir}")
-        
-        # 6. Run the decrypted software
-        print("\\n🧮 Running decrypted calculator...")
-        
-        # Change to the extracted directory
-        original_cwd = os.getcwd()
-        os.chdir(extracted_dir)
-        
-        try:
-            # Import and run the calculator
-            sys.path.insert(0, extracted_dir)
-            from calculator import AdvancedCalculator
+        # Vendor and enterprise sides share one scratch directory, removed
+        # on exit, pass or fail
+        with tempfile.TemporaryDirectory(prefix="cloq_workflow_") as scratch_dir, \
+                SoftwarePackage("advanced_calculator", scratch_dir) as package:
+            enterprise_temp_dir = os.path.join(scratch_dir, "enterprise")
+            os.makedirs(enterprise_temp_dir)
             
-            calc = AdvancedCalculator()
-            history = calc.run_demo()
+            # 1. Create software package
+            package.create_package()
+            
+            # 2. Load encryption keys
+            print("\\n🔑 Loading encryption keys...")
+            private_key, public_key = get_test_keypair()
+            print("✅ Keys loaded")
+            
+            # 3. Package and encrypt in one pass: tar -> gzip -> encrypted
+            # frames, with no plaintext tarball ever written out
+            print("\\n🔒 Packaging and encrypting software package...")
+            bundle_buffer = io.BytesIO()
+            with BundleWriter(bundle_buffer, public_key, f"{package.package_name}.tar.gz") as writer:
+                package.write_tarball(writer)
+            encrypted_bundle = bundle_buffer.getvalue()
+            
+            print("✅ Encrypted package")
+            print(f"📊 Encrypted size: {len(encrypted_bundle)} bytes")
+            
+            # === ENTERPRISE SIDE ===
+            print("\\n\\n🏢 ENTERPRISE SIDE - Decrypting and Running Software")
+            print("-" * 60)
+            
+            # 4-5. Enterprise decrypts and extracts in one pass: tarfile reads
+            # plaintext straight out of the bundle, with no decrypted tarball
+            # in between. Every frame is authenticated before it is handed on,
+            # so a tampered bundle raises instead of extracting
+            print("\\n🔓 Decrypting and extracting software package...")
+            
+            extracted_dir = os.path.join(enterprise_temp_dir, package.package_name)
+            
+            import tarfile
+            with BundleReader(io.BytesIO(encrypted_bundle), private_key) as reader, \
+                    tarfile.open(fileobj=reader, mode="r|gz", copybufsize=TAR_COPY_BUFSIZE) as tar:
+                tar.extractall(enterprise_temp_dir)
+            
+            print(f"✅ Extracted to: {extracted_dir}")
+            
+            # 6. Run the decrypted software
+            print("\\n🧮 Running decrypted calculator...")
+            
+            # Run the calculator in its own interpreter so the test process's
+            # sys.path, cwd and module cache are left untouched
+            result = subprocess.run(
+                [sys.executable, "calculator.py", "--json"],
+                cwd=extracted_dir, capture_output=True, check=True,
+                encoding="utf-8", env={**os.environ, "PYTHONIOENCODING": "utf-8"}
+            )
+            demo_output, _, history_json = result.stdout.rstrip().rpartition("\n")
+            print(demo_output)
+            history = orjson.loads(history_json)
             
             print(f"\\n✅ Calculator executed successfully!")
             print(f"📊 Operations performed: {len(history)}")
@@ -313,43 +223,28 @@ def test_full_workflow():
             ]
             
             print("\\n🔍 Verifying calculation results...")
-            all_correct = True
             
-            for i, (operation, a, b, expected) in enumerate(expected_results):
-                if i < len(history):
-                    actual = history[i]["result"]
-                    if abs(actual - expected) < 0.001:  # Allow for floating point precision
-                        print(f"  ✅ {operation}({a}, {b}) = {actual} (correct)")
-                    else:
-                        print(f"  ❌ {operation}({a}, {b}) = {actual}, expected {expected}")
-                        all_correct = False
-                else:
-                    print(f"  ❌ Missing result for {operation}({a}, {b})")
-                    all_correct = False
+            # Compare all results in one pass and report once; a missing
+            # result counts as a mismatch
+            actuals = [entry["result"] for entry in history[:len(expected_results)]]
+            actuals += [None] * (len(expected_results) - len(actuals))
+            mismatches = [
+                f"{operation}({a}, {b}) = {actual}, expected {expected}"
+                for (operation, a, b, expected), actual in zip(expected_results, actuals)
+                # Allow for floating point precision
+                if actual is None or not math.isclose(actual, expected, abs_tol=1e-3)
+            ]
+            all_correct = not mismatches
+            
+            if all_correct:
+                print(f"  ✅ {len(expected_results)}/{len(expected_results)} results correct")
+            else:
+                print("  ❌ " + "\n  ❌ ".join(mismatches))
             
             if all_correct:
                 print("\\n🎉 ALL CALCULATIONS CORRECT! Functionality preserved through encryption!")
             else:
                 print("\\n❌ Some calculations failed!")
-                
-        finally:
-            os.chdir(original_cwd)
-        
-        # === CLEANUP ===
-        print("\\n🧹 Cleaning up test files...")
-        package.cleanup()
-        
-        # Clean up test files
-        test_files = [encrypted_bundle_path, decrypted_tarball_path]
-        for file_path in test_files:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                print(f"  Removed: {file_path}")
-        
-        # Clean up enterprise temp dir
-        if os.path.exists(enterprise_temp_dir):
-            shutil.rmtree(enterprise_temp_dir)
-            print(f"  Removed: {enterprise_temp_dir}")
         
         print("\\n🎉 Full workflow test completed successfully!")
         print("\\n📋 SUMMARY:")
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Crypto Utils Test - Bundle API Checks
+
+Offline tests for the crypto_utils entry points the workflow tests don't
+exercise. No control plane is needed. Each test asserts, so a failure
+shows up both when run as a script and under pytest.
+"""
+
+import io
+import os
+import sys
+import tempfile
+import traceback
+from unittest import mock
+
+import _testpath  # noqa: F401  (adds the project root to sys.path)
+
+from src.cloq_cp import crypto_utils
+
+from src.cloq_cp.crypto_utils import (
+    FRAME_SIZE, CryptoError, encrypt_file, encrypt_files, decrypt_file, save_keypair,
+    encrypt_file_aes, decrypt_file_aes, generate_aes_key, verify_artifact,
+    encrypt_bytes, decrypt_bytes, BundleWriter, BundleReader, CIPHER_CHACHA20
+)
+from _keycache import get_test_keypair
+
+
+class ShortReadStream(io.RawIOBase):
+    """Raw stream that returns at most max_read bytes per read, like a pipe"""
+    
+    def __init__(self, data: bytes, max_read: int = 64 * 1024):
+        self._source = io.BytesIO(data)
+        self._max_read = max_read
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        with memoryview(buffer) as view:
+            return self._source.readinto(view[:self._max_read])
+
+
+def _write_keypair(work_dir: str):
+    """Save the shared test keypair into work_dir and return (private, public) paths"""
+    private_key, public_key = get_test_keypair()
+    private_key_path = os.path.join(work_dir, "private.pem")
+    public_key_path = os.path.join(work_dir, "public.pem")
+    save_keypair(private_key, public_key, private_key_path, public_key_path)
+    return private_key_path, public_key_path
+
+
+def test_encrypt_files():
+    """Encrypt several files in parallel and decrypt every bundle"""
+    print("📦 encrypt_files: parallel multi-file encryption")
+    
+    with tempfile.TemporaryDirectory(prefix="cloq_utils_") as work_dir:
+        private_key_path, public_key_path = _write_keypair(work_dir)
+        
+        originals = {}
+        for index, size in enumerate((0, 1, 1024 * 1024 + 1, 3000)):
+            path = os.path.join(work_dir, f"input_{index}.bin")
+            originals[path] = os.urandom(size)
+            with open(path, 'wb') as f:
+                f.write(originals[path])
+        
+        output_dir = os.path.join(work_dir, "bundles")
+        bundle_paths = encrypt_files(list(originals), public_key_path, output_dir, max_workers=2)
+        
+        assert len(bundle_paths) == len(originals)
+        for input_path, bundle_path in zip(originals, bundle_paths):
+            assert bundle_path == os.path.join(output_dir, f"{os.path.basename(input_path)}.cloq")
+            decrypted_path = decrypt_file(bundle_path, private_key_path, bundle_path + ".out")
+            with open(decrypted_path, 'rb') as f:
+                assert f.read() == originals[input_path], f"{input_path} did not round-trip"
+    
+    print(f"✅ {len(originals)} files encrypted in parallel and decrypted")
+
+
+def test_short_reads():
+    """Frames stay aligned when the source returns short reads"""
+    print("🧩 Framing: short reads from pipe-like streams")
+    
+    plaintext = os.urandom(2 * FRAME_SIZE + 123)
+    aes_key, iv = generate_aes_key(), os.urandom(12)
+    
+    ciphertext = io.BytesIO()
+    frames = encrypt_file_aes(ShortReadStream(plaintext), ciphertext, aes_key, iv)
+    assert frames == 3, f"expected 3 frames, got {frames}"
+    
+    decrypted = io.BytesIO()
+    decrypt_file_aes(ShortReadStream(ciphertext.getvalue()), decrypted, aes_key, iv)
+    assert decrypted.getvalue() == plaintext
+    
+    print(f"✅ {frames} frames written and read back through 64 KiB reads")
+
+
+def test_verify_artifact():
+    """verify_artifact accepts a good bundle and rejects damaged ones"""
+    print("🔍 verify_artifact: good, bit-flipped, truncated and wrong-key bundles")
+    
+    with tempfile.TemporaryDirectory(prefix="cloq_utils_") as work_dir:
+        private_key_path, public_key_path = _write_keypair(work_dir)
+        
+        input_path = os.path.join(work_dir, "input.bin")
+        with open(input_path, 'wb') as f:
+            f.write(os.urandom(FRAME_SIZE + 500))
+        bundle_path = encrypt_file(input_path, public_key_path, os.path.join(work_dir, "good.clq"))
+        with open(bundle_path, 'rb') as f:
+            bundle = f.read()
+        
+        assert verify_artifact(bundle_path, private_key_path), "good bundle rejected"
+        
+        flipped = bytearray(bundle)
+        flipped[-100] ^= 0x01
+        truncated = bundle[:-(500 + 16)]
+        for name, data in (("flipped", bytes(flipped)), ("truncated", truncated)):
+            damaged_path = os.path.join(work_dir, f"{name}.clq")
+            with open(damaged_path, 'wb') as f:
+                f.write(data)
+            assert not verify_artifact(damaged_path, private_key_path), f"{name} bundle accepted"
+        
+        # A different keypair cannot unwrap the bundle's key
+        other_private_key, _ = get_test_keypair(2048)
+        other_private_key_path = os.path.join(work_dir, "other_private.pem")
+        with open(other_private_key_path, 'wb') as f:
+            f.write(other_private_key)
+        assert not verify_artifact(bundle_path, other_private_key_path), "wrong key accepted"
+    
+    print("✅ Good bundle verified; flipped, truncated and wrong-key bundles rejected")
+
+
+def test_bytes_round_trip():
+    """encrypt_bytes/decrypt_bytes round-trip every frame boundary case"""
+    print("🔁 encrypt_bytes/decrypt_bytes: frame boundary sizes")
+    
+    private_key, public_key = get_test_keypair()
+    sizes = (0, 1, FRAME_SIZE - 1, FRAME_SIZE, FRAME_SIZE + 1, 3 * FRAME_SIZE + 7)
+    for size in sizes:
+        plaintext = os.urandom(size)
+        bundle = encrypt_bytes(plaintext, public_key, "payload.bin")
+        assert decrypt_bytes(bundle, private_key) == plaintext, f"{size} bytes did not round-trip"
+    
+    # Authentication still applies to in-memory bundles
+    tampered = bytearray(bundle)
+    tampered[-1] ^= 0x01
+    try:
+        decrypt_bytes(bytes(tampered), private_key)
+    except CryptoError:
+        pass
+    else:
+        raise AssertionError("tampered bundle decrypted")
+    
+    print(f"✅ {len(sizes)} sizes round-tripped; tampered bundle rejected")
+
+
+def test_aborted_writer():
+    """A BundleWriter left by an exception produces an undecryptable bundle"""
+    print("🛑 BundleWriter: aborted writes must not authenticate")
+    
+    private_key, public_key = get_test_keypair()
+    for size in (7, FRAME_SIZE + 7):
+        bundle = io.BytesIO()
+        try:
+            with BundleWriter(bundle, public_key) as writer:
+                writer.write(os.urandom(size))
+                raise RuntimeError("producer failed")
+        except RuntimeError:
+            pass
+        
+        assert writer.closed
+        try:
+            decrypt_bytes(bundle.getvalue(), private_key)
+        except CryptoError:
+            pass
+        else:
+            raise AssertionError(f"aborted {size}-byte bundle decrypted")
+    
+    # A clean exit still finalizes the bundle
+    bundle = io.BytesIO()
+    with BundleWriter(bundle, public_key) as writer:
+        writer.write(b"complete")
+    assert decrypt_bytes(bundle.getvalue(), private_key) == b"complete"
+    
+    print("✅ Aborted bundles rejected; completed bundle decrypts")
+
+
+def test_chacha20_bundle():
+    """A ChaCha20-Poly1305 bundle round-trips through BundleWriter and BundleReader"""
+    print("🌀 ChaCha20-Poly1305: multi-frame writer/reader round trip")
+    
+    private_key, public_key = get_test_keypair()
+    plaintext = os.urandom(2 * FRAME_SIZE + 99)
+    
+    # Hosts with AES-NI never pick ChaCha20 on their own
+    bundle = io.BytesIO()
+    with mock.patch.object(crypto_utils, "default_cipher", return_value=CIPHER_CHACHA20):
+        with BundleWriter(bundle, public_key, "payload.bin") as writer:
+            writer.write(plaintext)
+    
+    bundle.seek(0)
+    with BundleReader(bundle, private_key) as reader:
+        assert reader.read() == plaintext
+    assert b'"cipher":"ChaCha20-Poly1305"' in bundle.getvalue()[:4096]
+    assert decrypt_bytes(bundle.getvalue(), private_key) == plaintext
+    
+    print("✅ ChaCha20-Poly1305 bundle written, recorded and read back")
+
+
+def _read_all(bundle: bytes, private_key: bytes, max_read: int = None) -> bytes:
+    """Decrypt a bundle through BundleReader, optionally over a short-read stream"""
+    stream = ShortReadStream(bundle, max_read) if max_read else io.BytesIO(bundle)
+    with BundleReader(stream, private_key) as reader:
+        return reader.read()
+
+
+def test_bundle_reader():
+    """BundleReader handles short reads and rejects damaged bundles"""
+    print("📖 BundleReader: short reads, tampering, truncation, bad headers")
+    
+    private_key, public_key = get_test_keypair()
+    plaintext = os.urandom(2 * FRAME_SIZE + 5)
+    bundle = encrypt_bytes(plaintext, public_key)
+    
+    assert _read_all(bundle, private_key) == plaintext
+    assert _read_all(bundle, private_key, max_read=64 * 1024) == plaintext
+    
+    flipped = bytearray(bundle)
+    flipped[len(bundle) // 2] ^= 0x01
+    other_private_key, _ = get_test_keypair(2048)
+    rejected = {
+        "bit-flipped": (bytes(flipped), private_key),
+        "truncated": (bundle[:-(5 + 16)], private_key),
+        "header-only": (bundle[:len(bundle) - len(plaintext) - 3 * 16], private_key),
+        "not a bundle": (b"not a cloq bundle at all, just some text", private_key),
+        "corrupt metadata": (bundle.replace(b'"original_filename"', b'"original_filename{', 1), private_key),
+        "wrong key": (bundle, other_private_key),
+    }
+    for name, (data, key) in rejected.items():
+        try:
+            _read_all(data, key)
+        except CryptoError:
+            pass
+        else:
+            raise AssertionError(f"{name} bundle was read without CryptoError")
+    
+    print(f"✅ Short reads handled; {len(rejected)} damaged bundles rejected with CryptoError")
+
+
+def test_same_file_rejected():
+    """encrypt_file/decrypt_file refuse to overwrite their own input"""
+    print("🚫 encrypt_file/decrypt_file: output path equal to input path")
+    
+    with tempfile.TemporaryDirectory(prefix="cloq_utils_") as work_dir:
+        private_key_path, public_key_path = _write_keypair(work_dir)
+        
+        input_path = os.path.join(work_dir, "input.bin")
+        plaintext = os.urandom(FRAME_SIZE + 10)
+        with open(input_path, 'wb') as f:
+            f.write(plaintext)
+        bundle_path = encrypt_file(input_path, public_key_path, os.path.join(work_dir, "bundle.clq"))
+        with open(bundle_path, 'rb') as f:
+            bundle = f.read()
+        
+        link_path = os.path.join(work_dir, "bundle_link.clq")
+        os.link(bundle_path, link_path)
+        
+        calls = (
+            ("encrypt in place", lambda: encrypt_file(input_path, public_key_path, input_path)),
+            ("decrypt in place", lambda: decrypt_file(bundle_path, private_key_path, bundle_path)),
+            ("decrypt onto a hard link", lambda: decrypt_file(bundle_path, private_key_path, link_path)),
+        )
+        for name, call in calls:
+            try:
+                call()
+            except CryptoError:
+                pass
+            else:
+                raise AssertionError(f"{name} was allowed")
+        
+        # Both inputs are left intact
+        with open(input_path, 'rb') as f:
+            assert f.read() == plaintext, "input was overwritten"
+        with open(bundle_path, 'rb') as f:
+            assert f.read() == bundle, "bundle was overwritten"
+    
+    print(f"✅ {len(calls)} same-file calls rejected; inputs untouched")
+
+
+TESTS = [
+    test_encrypt_files,
+    test_short_reads,
+    test_verify_artifact,
+    test_bytes_round_trip,
+    test_aborted_writer,
+    test_chacha20_bundle,
+    test_bundle_reader,
+    test_same_file_rejected,
+]
+
+
+if __name__ == "__main__":
+    print("🚀 Cloq Crypto Utils Tests")
+    print("=" * 60)
+    
+    failures = 0
+    for test in TESTS:
+        try:
+            test()
+        except Exception:
+            failures += 1
+            print(f"❌ {test.__name__} failed")
+            traceback.print_exc()
+    
+    if failures:
+        print(f"\n❌ {failures}/{len(TESTS)} tests failed")
+        sys.exit(1)
+    print(f"\n🎉 All {len(TESTS)} crypto utils tests passed!")
+    sys.exit(0)
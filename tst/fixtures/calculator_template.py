@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Advanced Calculator - Vendor Software Package
+This simulates a complex software package with multiple functionalities
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+# Prefer orjson when the host has it; the package must still run without it
+try:
+    import orjson
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:
+    _loads = json.loads
+    def _dumps(obj):
+        return json.dumps(obj).encode("utf-8")
+
+class AdvancedCalculator:
+    """Advanced calculator with multiple operations"""
+    
+    def __init__(self, config_file="config.json"):
+        self.config_file = config_file
+        self.load_config()
+        self.operation_history = []
+        self._fib_cache = [0, 1]
+    
+    def load_config(self):
+        """Load configuration from file"""
+        try:
+            if os.path.exists(self.config_file):
+                with open(self.config_file, 'rb') as f:
+                    self.config = _loads(f.read())
+            else:
+                self.config = {"precision": 10, "log_operations": True}
+        except Exception as e:
+            self.config = {"precision": 10, "log_operations": True}
+            print(f"Warning: Could not load config: {e}")
+    
+    def add(self, a, b):
+        """Add two numbers"""
+        result = a + b
+        self._log_operation("add", a, b, result)
+        return round(result, self.config.get("precision", 10))
+    
+    def multiply(self, a, b):
+        """Multiply two numbers"""
+        result = a * b
+        self._log_operation("multiply", a, b, result)
+        return round(result, self.config.get("precision", 10))
+    
+    def power(self, base, exponent):
+        """Calculate base raised to exponent"""
+        result = base ** exponent
+        self._log_operation("power", base, exponent, result)
+        return round(result, self.config.get("precision", 10))
+    
+    def fibonacci(self, n):
+        """Calculate nth Fibonacci number"""
+        if n <= 0:
+            return 0
+        elif n == 1:
+            return 1
+        else:
+            # Extend the cached sequence only as far as needed
+            cache = self._fib_cache
+            while len(cache) <= n:
+                cache.append(cache[-1] + cache[-2])
+            self._log_operation("fibonacci", n, None, cache[n])
+            return cache[n]
+    
+    def _log_operation(self, operation, a, b, result):
+        """Log operation to history"""
+        if not self.config.get("log_operations", True):
+            return
+        
+        # Store a raw timestamp; it is only formatted when history is read
+        log_entry = {
+            "timestamp_ns": time.time_ns(),
+            "operation": operation,
+            "operands": [a, b] if b is not None else [a],
+            "result": result
+        }
+        self.operation_history.append(log_entry)
+    
+    def get_history(self):
+        """Get operation history with ISO formatted timestamps"""
+        history = []
+        for entry in self.operation_history:
+            entry = dict(entry)
+            entry["timestamp"] = datetime.fromtimestamp(entry.pop("timestamp_ns") / 1e9).isoformat()
+            history.append(entry)
+        return history
+    
+    def clear_history(self):
+        """Clear operation history"""
+        self.operation_history = []
+    
+    def run_demo(self):
+        """Run a demonstration of calculator functionality"""
+        print("🧮 Advanced Calculator Demo")
+        print("=" * 40)
+        
+        # Test basic operations
+        print(f"Addition: 15 + 27 = {self.add(15, 27)}")
+        print(f"Multiplication: 8 * 12 = {self.multiply(8, 12)}")
+        print(f"Power: 2^10 = {self.power(2, 10)}")
+        print(f"Fibonacci(10) = {self.fibonacci(10)}")
+        
+        # Test with decimals
+        print(f"Decimal add: 3.14159 + 2.71828 = {self.add(3.14159, 2.71828)}")
+        
+        print("\n📊 Operation History:")
+        history = self.get_history()
+        for entry in history:
+            print(f"  {entry['timestamp']}: {entry['operation']}({entry['operands']}) = {entry['result']}")
+        
+        return history
+
+def main():
+    """Main entry point for the calculator"""
+    calc = AdvancedCalculator()
+    history = calc.run_demo()
+    
+    # Machine-readable history on the last line, for callers running us as a subprocess
+    if "--json" in sys.argv[1:]:
+        print(_dumps(history).decode("utf-8"))
+    return history
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Local Storage Test - SQLite Metadata Store Checks
+
+Offline tests for LocalStorage against a temporary directory: artifact
+round trips, the vendor filter and the one-time import of a legacy
+metadata.json. Each test asserts, so a failure shows up both when run as
+a script and under pytest.
+"""
+
+import sys
+import tempfile
+import traceback
+from pathlib import Path
+
+import orjson
+
+import _testpath  # noqa: F401  (adds the project root to sys.path)
+
+from src.cloq_cp.storage.local_storage import LocalStorage
+
+
+def test_store_round_trip():
+    """Stored artifacts come back intact and delete removes file and metadata"""
+    print("💾 LocalStorage: store, retrieve, stats and delete")
+    
+    with tempfile.TemporaryDirectory(prefix="cloq_storage_") as work_dir:
+        storage = LocalStorage(work_dir)
+        try:
+            file_path = storage.store_artifact("a1", b"bundle bytes", {"vendor_id": "acme"})
+            assert Path(file_path).read_bytes() == b"bundle bytes"
+            assert storage.retrieve_artifact("a1") == b"bundle bytes"
+            
+            metadata = storage.get_artifact_metadata("a1")
+            assert metadata["vendor_id"] == "acme"
+            assert metadata["file_size"] == len(b"bundle bytes")
+            assert metadata["file_path"] == file_path
+            
+            stats = storage.get_storage_stats()
+            assert stats["total_artifacts"] == 1
+            assert stats["total_size_bytes"] == len(b"bundle bytes")
+            
+            assert storage.delete_artifact("a1")
+            assert not Path(file_path).exists()
+            assert storage.get_artifact_metadata("a1") is None
+            assert storage.retrieve_artifact("a1") is None
+            assert not storage.delete_artifact("a1"), "deleting a missing artifact reported success"
+        finally:
+            storage.close()
+        
+        # Metadata persists across connections
+        storage = LocalStorage(work_dir)
+        try:
+            storage.store_artifact("a2", b"x", {"vendor_id": "acme"})
+        finally:
+            storage.close()
+        storage = LocalStorage(work_dir)
+        try:
+            assert storage.get_artifact_metadata("a2")["vendor_id"] == "acme"
+        finally:
+            storage.close()
+    
+    print("✅ Artifact round-tripped, persisted and deleted")
+
+
+def test_vendor_filter():
+    """list_artifacts returns everything, or only the given vendor's artifacts"""
+    print("🏷️ LocalStorage: vendor filter")
+    
+    with tempfile.TemporaryDirectory(prefix="cloq_storage_") as work_dir:
+        storage = LocalStorage(work_dir)
+        try:
+            storage.store_artifact("a1", b"1", {"vendor_id": "acme"})
+            storage.store_artifact("b1", b"2", {"vendor_id": "globex"})
+            storage.store_artifact("a2", b"3", {"vendor_id": "acme"})
+            storage.store_artifact("n1", b"4", {})
+            
+            assert [a["artifact_id"] for a in storage.list_artifacts()] == ["a1", "b1", "a2", "n1"]
+            assert [a["artifact_id"] for a in storage.list_artifacts("acme")] == ["a1", "a2"]
+            assert [a["artifact_id"] for a in storage.list_artifacts("globex")] == ["b1"]
+            assert storage.list_artifacts("initech") == []
+        finally:
+            storage.close()
+    
+    print("✅ Vendor filter returns only matching artifacts, in insertion order")
+
+
+def test_legacy_migration():
+    """A legacy metadata.json is imported once and renamed"""
+    print("📜 LocalStorage: legacy metadata.json migration")
+    
+    with tempfile.TemporaryDirectory(prefix="cloq_storage_") as work_dir:
+        legacy_path = Path(work_dir) / "metadata.json"
+        legacy_path.write_bytes(orjson.dumps({
+            "old1": {"vendor_id": "acme", "file_size": 10, "stored_at": "2025-01-01T00:00:00"},
+            "old2": {"vendor_id": "globex", "file_size": 20}
+        }))
+        
+        storage = LocalStorage(work_dir)
+        try:
+            assert not legacy_path.exists(), "legacy metadata.json was not moved aside"
+            assert (Path(work_dir) / "metadata.json.migrated").exists()
+            
+            assert storage.get_artifact_metadata("old1")["file_size"] == 10
+            assert [a["artifact_id"] for a in storage.list_artifacts("globex")] == ["old2"]
+            assert storage.get_storage_stats()["total_size_bytes"] == 30
+        finally:
+            storage.close()
+        
+        # Reopening does not import again
+        storage = LocalStorage(work_dir)
+        try:
+            assert len(storage.list_artifacts()) == 2
+        finally:
+            storage.close()
+    
+    with tempfile.TemporaryDirectory(prefix="cloq_storage_") as work_dir:
+        # A corrupt legacy file imports nothing but is still moved aside
+        legacy_path = Path(work_dir) / "metadata.json"
+        legacy_path.write_bytes(b"{not json")
+        
+        storage = LocalStorage(work_dir)
+        try:
+            assert not legacy_path.exists()
+            assert storage.list_artifacts() == []
+        finally:
+            storage.close()
+    
+    print("✅ Legacy metadata imported once and renamed; corrupt file skipped")
+
+
+TESTS = [
+    test_store_round_trip,
+    test_vendor_filter,
+    test_legacy_migration,
+]
+
+
+if __name__ == "__main__":
+    print("🚀 Cloq Local Storage Tests")
+    print("=" * 60)
+    
+    failures = 0
+    for test in TESTS:
+        try:
+            test()
+        except Exception:
+            failures += 1
+            print(f"❌ {test.__name__} failed")
+            traceback.print_exc()
+    
+    if failures:
+        print(f"\n❌ {failures}/{len(TESTS)} tests failed")
+        sys.exit(1)
+    print(f"\n🎉 All {len(TESTS)} local storage tests passed!")
+    sys.exit(0)